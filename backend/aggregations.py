@@ -0,0 +1,597 @@
+"""
+Aggregation engine for the financial summaries.
+
+Summaries read the `monthly_category_totals` table, which holds one row per
+(year, month, type, category) and is updated in the same database transaction
+as every write to `transactions`. Query builders return plain `select()`
+statements and the shaping functions turn their rows into response models.
+
+Date-range summaries (?from=&to=) read `daily_category_totals` instead: one row
+per (day, type, category) that also carries the running total of its
+(type, category) series. The total of any range is then the running total at
+its last day minus the one before its first day, two index lookups per series
+whatever the length of the range. A write upserts the affected days and
+recomputes the running totals of each affected series from the earliest
+affected day on.
+
+Rebuild the aggregate tables from the ledger (e.g. after a backfill) with:
+
+    python -m backend.aggregations rebuild
+    python -m backend.aggregations rebuild --user-id 2   # FINANZAS_TENANCY=per_user
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Date, and_, cast, delete, func, insert, literal, select, true, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, aliased
+
+from .database import Transaction, Category, Budget, MonthlyCategoryTotal, DailyCategoryTotal
+from .categories import get_category_map
+from .models import FinancialSummary, CategorySummary, MonthlySummary, BudgetResponse
+
+
+# (year, month, type, category_id, amount, day) of a single transaction
+LedgerEntry = Tuple[int, int, str, int, float, Optional[date]]
+
+# Points looked up per query by running_totals_at (SQLite caps a UNION at 500 terms)
+RUNNING_TOTAL_POINTS_PER_QUERY = 200
+
+
+class CategoryTotal(NamedTuple):
+    """Total of one (type, category) over a date range, shaped like a category_totals_query row"""
+    type: str
+    category_id: int
+    name: Optional[str]
+    color: Optional[str]
+    icon: Optional[str]
+    total: float
+
+
+class MonthlyCategoryRow(NamedTuple):
+    """Total of one (type, category) in one month, shaped like a monthly_category_totals_query row"""
+    year: int
+    month: int
+    type: str
+    category_id: int
+    name: Optional[str]
+    total: float
+
+
+# Transaction columns a LedgerEntry is built from, e.g. for DELETE ... RETURNING
+LEDGER_COLUMNS = (
+    Transaction.year, Transaction.month, Transaction.type,
+    Transaction.category_id, Transaction.amount, Transaction.date,
+)
+
+
+def ledger_entry(trans) -> LedgerEntry:
+    """
+    Snapshot the fields of a transaction that the aggregate tables depend on;
+    `trans` is a Transaction or a row of LEDGER_COLUMNS.
+    """
+    return (
+        trans.year, trans.month, trans.type, trans.category_id, trans.amount or 0,
+        trans.date.date() if trans.date else None
+    )
+
+
+def _dialect_insert(db: Session):
+    """INSERT construct that supports ON CONFLICT for the session's database"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def update_monthly_totals(
+    db: Session,
+    removed: Iterable[LedgerEntry] = (),
+    added: Iterable[LedgerEntry] = ()
+):
+    """
+    Apply transactions leaving (removed) and entering (added) the ledger to
+    the monthly totals. Runs as one upsert in the caller's transaction, so it
+    is committed or rolled back together with the transaction rows.
+    """
+    deltas = defaultdict(lambda: [0.0, 0])
+    for entries, sign in ((removed, -1), (added, 1)):
+        for year, month, trans_type, category_id, amount, _ in entries:
+            if category_id is None:
+                continue
+            delta = deltas[(year, month, trans_type, category_id)]
+            delta[0] += sign * amount
+            delta[1] += sign
+
+    params = [
+        {
+            "year": year,
+            "month": month,
+            "type": trans_type,
+            "category_id": category_id,
+            "total": total,
+            "transaction_count": count,
+        }
+        for (year, month, trans_type, category_id), (total, count) in deltas.items()
+        if total != 0 or count != 0
+    ]
+    if not params:
+        return
+
+    stmt = _dialect_insert(db)(MonthlyCategoryTotal)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["year", "month", "type", "category_id"],
+        set_={
+            "total": MonthlyCategoryTotal.total + stmt.excluded.total,
+            "transaction_count": MonthlyCategoryTotal.transaction_count + stmt.excluded.transaction_count,
+        }
+    )
+    db.execute(stmt, params)
+
+
+def update_daily_totals(
+    db: Session,
+    removed: Iterable[LedgerEntry] = (),
+    added: Iterable[LedgerEntry] = ()
+):
+    """
+    Apply transactions leaving (removed) and entering (added) the ledger to
+    the daily totals and their running totals, in the caller's transaction.
+    """
+    deltas = defaultdict(lambda: [0.0, 0])
+    for entries, sign in ((removed, -1), (added, 1)):
+        for _, _, trans_type, category_id, amount, day in entries:
+            if category_id is None or day is None:
+                continue
+            delta = deltas[(day, trans_type, category_id)]
+            delta[0] += sign * amount
+            delta[1] += sign
+
+    params = [
+        {
+            "day": day,
+            "type": trans_type,
+            "category_id": category_id,
+            "total": total,
+            "transaction_count": count,
+            "cum_total": 0,
+            "cum_count": 0,
+        }
+        for (day, trans_type, category_id), (total, count) in deltas.items()
+        if total != 0 or count != 0
+    ]
+    if not params:
+        return
+
+    # Running totals are left at 0 for new days and fixed up below
+    stmt = _dialect_insert(db)(DailyCategoryTotal)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["type", "category_id", "day"],
+        set_={
+            "total": DailyCategoryTotal.total + stmt.excluded.total,
+            "transaction_count": DailyCategoryTotal.transaction_count + stmt.excluded.transaction_count,
+        }
+    )
+    db.execute(stmt, params)
+
+    first_changed_day = {}
+    for row in params:
+        series = (row["type"], row["category_id"])
+        if series not in first_changed_day or row["day"] < first_changed_day[series]:
+            first_changed_day[series] = row["day"]
+    for (trans_type, category_id), from_day in first_changed_day.items():
+        _refresh_running_totals(db, trans_type, category_id, from_day)
+
+
+def _refresh_running_totals(db: Session, trans_type: str, category_id: int, from_day: date):
+    """Recompute the running totals of one (type, category) series from `from_day` on"""
+    in_series = (DailyCategoryTotal.type == trans_type, DailyCategoryTotal.category_id == category_id)
+    base = db.execute(
+        select(DailyCategoryTotal.cum_total, DailyCategoryTotal.cum_count)
+        .where(*in_series, DailyCategoryTotal.day < from_day)
+        .order_by(DailyCategoryTotal.day.desc())
+        .limit(1)
+    ).first()
+    base_total, base_count = base if base else (0.0, 0)
+
+    running = (
+        select(
+            DailyCategoryTotal.id,
+            (base_total + func.sum(DailyCategoryTotal.total).over(order_by=DailyCategoryTotal.day))
+            .label("cum_total"),
+            (base_count + func.sum(DailyCategoryTotal.transaction_count).over(order_by=DailyCategoryTotal.day))
+            .label("cum_count"),
+        )
+        .where(*in_series, DailyCategoryTotal.day >= from_day)
+        .subquery()
+    )
+    db.execute(
+        update(DailyCategoryTotal)
+        .where(DailyCategoryTotal.id == running.c.id)
+        .values(cum_total=running.c.cum_total, cum_count=running.c.cum_count)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def update_ledger_totals(
+    db: Session,
+    removed: Iterable[LedgerEntry] = (),
+    added: Iterable[LedgerEntry] = ()
+):
+    """Apply ledger changes to both the monthly and the daily aggregate tables"""
+    removed, added = list(removed), list(added)
+    update_monthly_totals(db, removed=removed, added=added)
+    update_daily_totals(db, removed=removed, added=added)
+
+
+def rebuild_monthly_totals(db: Session):
+    """Recompute the whole monthly aggregate table from the transactions table"""
+    db.execute(delete(MonthlyCategoryTotal))
+    db.execute(
+        insert(MonthlyCategoryTotal).from_select(
+            ["year", "month", "type", "category_id", "total", "transaction_count"],
+            select(
+                Transaction.year,
+                Transaction.month,
+                Transaction.type,
+                Transaction.category_id,
+                func.sum(Transaction.amount),
+                func.count(Transaction.id),
+            )
+            .where(Transaction.category_id.is_not(None))
+            .group_by(
+                Transaction.year, Transaction.month,
+                Transaction.type, Transaction.category_id
+            )
+        )
+    )
+
+
+def rebuild_daily_totals(db: Session):
+    """Recompute the whole daily aggregate table, running totals included, from the transactions table"""
+    if db.get_bind().dialect.name == "sqlite":
+        day = func.date(Transaction.date)
+    else:
+        day = cast(Transaction.date, Date)
+
+    daily = (
+        select(
+            day.label("day"),
+            Transaction.type,
+            Transaction.category_id,
+            func.sum(Transaction.amount).label("total"),
+            func.count(Transaction.id).label("transaction_count"),
+        )
+        .where(Transaction.category_id.is_not(None), Transaction.date.is_not(None))
+        .group_by(day, Transaction.type, Transaction.category_id)
+        .subquery()
+    )
+    series_order = {"partition_by": (daily.c.type, daily.c.category_id), "order_by": daily.c.day}
+
+    db.execute(delete(DailyCategoryTotal))
+    db.execute(
+        insert(DailyCategoryTotal).from_select(
+            ["day", "type", "category_id", "total", "transaction_count", "cum_total", "cum_count"],
+            select(
+                daily.c.day,
+                daily.c.type,
+                daily.c.category_id,
+                daily.c.total,
+                daily.c.transaction_count,
+                func.sum(daily.c.total).over(**series_order),
+                func.sum(daily.c.transaction_count).over(**series_order),
+            )
+        )
+    )
+
+
+def day_before(day: date) -> Optional[date]:
+    """The previous day; None (before every day) for date.min"""
+    return day - timedelta(days=1) if day > date.min else None
+
+
+def running_totals_at(
+    db: Session, points: List[Optional[date]]
+) -> Dict[Tuple[str, int], List[Tuple[float, int]]]:
+    """
+    Running (total, count) of every (type, category) series at the end of each
+    of the given days, in the same order as `points`. A None point is before
+    every day, where all series are (0.0, 0).
+    """
+    # The monthly table is much smaller than the daily one and has the same series
+    series = select(MonthlyCategoryTotal.type, MonthlyCategoryTotal.category_id).distinct().subquery()
+    result = defaultdict(lambda: [(0.0, 0)] * len(points))
+
+    for start in range(0, len(points), RUNNING_TOTAL_POINTS_PER_QUERY):
+        chunk = [
+            (index, point)
+            for index, point in enumerate(points[start:start + RUNNING_TOTAL_POINTS_PER_QUERY], start)
+            if point is not None
+        ]
+        if not chunk:
+            continue
+        point_rows = union_all(*[
+            select(literal(index).label("index"), literal(point, Date).label("point"))
+            for index, point in chunk
+        ]).subquery()
+        # Last day of the series on or before the point
+        earlier = aliased(DailyCategoryTotal)
+        last_day = (
+            select(func.max(earlier.day))
+            .where(
+                earlier.type == series.c.type,
+                earlier.category_id == series.c.category_id,
+                earlier.day <= point_rows.c.point,
+            )
+            .correlate(series, point_rows)
+            .scalar_subquery()
+        )
+        rows = db.execute(
+            select(
+                point_rows.c.index,
+                series.c.type,
+                series.c.category_id,
+                DailyCategoryTotal.cum_total,
+                DailyCategoryTotal.cum_count,
+            )
+            .select_from(point_rows)
+            .join(series, true())
+            .join(
+                DailyCategoryTotal,
+                and_(
+                    DailyCategoryTotal.type == series.c.type,
+                    DailyCategoryTotal.category_id == series.c.category_id,
+                    DailyCategoryTotal.day == last_day,
+                )
+            )
+        ).all()
+        for row in rows:
+            result[(row.type, row.category_id)][row.index] = (row.cum_total, row.cum_count)
+    return result
+
+
+def daily_totals_bounds(db: Session) -> Tuple[Optional[date], Optional[date]]:
+    """First and last day with aggregated transactions"""
+    return tuple(db.execute(
+        select(func.min(DailyCategoryTotal.day), func.max(DailyCategoryTotal.day))
+        .where(DailyCategoryTotal.transaction_count > 0)
+    ).one())
+
+
+def range_category_totals(
+    db: Session, date_from: Optional[date], date_to: Optional[date]
+) -> List[CategoryTotal]:
+    """Totals per (type, category) between two days (inclusive; None = unbounded)"""
+    points = [day_before(date_from) if date_from else None, date_to or date.max]
+    categories = get_category_map(db)
+    rows = []
+    for (trans_type, category_id), (before, last) in running_totals_at(db, points).items():
+        if last[1] - before[1] <= 0:
+            continue
+        category = categories.get(category_id)
+        rows.append(CategoryTotal(
+            type=trans_type,
+            category_id=category_id,
+            name=category.name if category else None,
+            color=category.color if category else None,
+            icon=category.icon if category else None,
+            # Differences of running totals carry float noise; amounts are in cents
+            total=round(last[0] - before[0], 2),
+        ))
+    return rows
+
+
+def range_monthly_totals(
+    db: Session, date_from: date, date_to: date
+) -> Tuple[List[MonthlyCategoryRow], List[Tuple[int, int]]]:
+    """
+    Totals per (month, type, category) between two days (inclusive), and the
+    (year, month) pairs the range touches. The first and last months only
+    count the days inside the range.
+    """
+    months = []
+    points = [day_before(date_from)]
+    year, month = date_from.year, date_from.month
+    while (year, month) < (date_to.year, date_to.month):
+        months.append((year, month))
+        next_month = date(year + month // 12, month % 12 + 1, 1)
+        points.append(next_month - timedelta(days=1))
+        year, month = next_month.year, next_month.month
+    # The last month ends at date_to (stepping past it would overflow in December 9999)
+    months.append((year, month))
+    points.append(date_to)
+
+    categories = get_category_map(db)
+    rows = []
+    for (trans_type, category_id), values in running_totals_at(db, points).items():
+        category = categories.get(category_id)
+        for (year, month), before, last in zip(months, values, values[1:]):
+            if last[1] - before[1] <= 0:
+                continue
+            rows.append(MonthlyCategoryRow(
+                year=year,
+                month=month,
+                type=trans_type,
+                category_id=category_id,
+                name=category.name if category else None,
+                total=round(last[0] - before[0], 2),
+            ))
+    return rows, months
+
+
+def category_totals_query(month: Optional[int] = None, year: Optional[int] = None):
+    """Totals per (type, category) joined to the category display fields"""
+    stmt = (
+        select(
+            MonthlyCategoryTotal.type,
+            MonthlyCategoryTotal.category_id,
+            Category.name,
+            Category.color,
+            Category.icon,
+            func.sum(MonthlyCategoryTotal.total).label("total"),
+        )
+        .outerjoin(Category, Category.id == MonthlyCategoryTotal.category_id)
+        .where(MonthlyCategoryTotal.transaction_count > 0)
+        .group_by(
+            MonthlyCategoryTotal.type, MonthlyCategoryTotal.category_id,
+            Category.name, Category.color, Category.icon
+        )
+    )
+    if month:
+        stmt = stmt.where(MonthlyCategoryTotal.month == month)
+    if year:
+        stmt = stmt.where(MonthlyCategoryTotal.year == year)
+    return stmt
+
+
+def build_financial_summary(rows) -> FinancialSummary:
+    """Shape (type, category_id, name, color, icon, total) rows into a FinancialSummary"""
+    totals = {"ingreso": 0.0, "gasto": 0.0}
+    by_category = {"ingreso": [], "gasto": []}
+
+    for row in rows:
+        if row.type not in totals:
+            continue
+        totals[row.type] += row.total or 0
+        # Transactions whose category no longer exists count towards the
+        # totals but are left out of the breakdown
+        if row.name is not None:
+            by_category[row.type].append(row)
+
+    def summaries(trans_type):
+        grand_total = totals[trans_type]
+        return [
+            CategorySummary(
+                category_name=row.name,
+                category_color=row.color,
+                category_icon=row.icon,
+                total=row.total,
+                percentage=(row.total / grand_total * 100) if grand_total > 0 else 0
+            )
+            for row in sorted(by_category[trans_type], key=lambda r: r.total, reverse=True)
+        ]
+
+    return FinancialSummary(
+        total_income=totals["ingreso"],
+        total_expenses=totals["gasto"],
+        balance=totals["ingreso"] - totals["gasto"],
+        expense_by_category=summaries("gasto"),
+        income_by_category=summaries("ingreso")
+    )
+
+
+def monthly_category_totals_query(years):
+    """Totals per (year, month, type, category) for the given years"""
+    return (
+        select(
+            MonthlyCategoryTotal.year,
+            MonthlyCategoryTotal.month,
+            MonthlyCategoryTotal.type,
+            MonthlyCategoryTotal.category_id,
+            Category.name,
+            MonthlyCategoryTotal.total,
+        )
+        .outerjoin(Category, Category.id == MonthlyCategoryTotal.category_id)
+        .where(
+            MonthlyCategoryTotal.year.in_(years),
+            MonthlyCategoryTotal.transaction_count > 0
+        )
+    )
+
+
+def budgets_with_spent_query(month: int, year: int):
+    """Budgets of a month with their category name and spent amount, in one query"""
+    return (
+        select(
+            Budget.id,
+            Budget.category_id,
+            Category.name.label("category_name"),
+            Budget.amount,
+            Budget.month,
+            Budget.year,
+            func.coalesce(MonthlyCategoryTotal.total, 0).label("spent"),
+        )
+        .outerjoin(Category, Category.id == Budget.category_id)
+        .outerjoin(
+            MonthlyCategoryTotal,
+            and_(
+                MonthlyCategoryTotal.category_id == Budget.category_id,
+                MonthlyCategoryTotal.month == Budget.month,
+                MonthlyCategoryTotal.year == Budget.year,
+                MonthlyCategoryTotal.type == "gasto",
+            )
+        )
+        .where(Budget.month == month, Budget.year == year)
+        .order_by(Budget.id)
+    )
+
+
+def build_budget_response(row) -> BudgetResponse:
+    """Shape a budgets_with_spent_query row into a BudgetResponse"""
+    return BudgetResponse(
+        id=row.id,
+        category_id=row.category_id,
+        category_name=row.category_name or "Sin categoría",
+        amount=row.amount,
+        month=row.month,
+        year=row.year,
+        spent=row.spent
+    )
+
+
+def build_monthly_summaries(rows, months: List[Tuple[int, int]]) -> List[MonthlySummary]:
+    """Shape (year, month, type, category_id, name, total) rows into one summary per (year, month)"""
+    income = defaultdict(float)
+    expenses = defaultdict(float)
+    expense_by_cat = defaultdict(lambda: defaultdict(float))
+
+    for row in rows:
+        key = (row.year, row.month)
+        if row.type == "ingreso":
+            income[key] += row.total or 0
+        elif row.type == "gasto":
+            expenses[key] += row.total or 0
+            if row.name is not None:
+                expense_by_cat[key][row.name] += row.total or 0
+
+    summaries = []
+    for key in months:
+        by_cat = expense_by_cat.get(key)
+        top_category = max(by_cat.items(), key=lambda x: x[1])[0] if by_cat else None
+        summaries.append(MonthlySummary(
+            month=key[1],
+            year=key[0],
+            total_income=income[key],
+            total_expenses=expenses[key],
+            balance=income[key] - expenses[key],
+            top_expense_category=top_category
+        ))
+    return summaries
+
+
+if __name__ == "__main__":
+    import argparse
+    from .database import init_db
+    from .response_cache import bump_data_version
+    from .tenancy import ledger_session, PER_USER_LEDGERS
+
+    parser = argparse.ArgumentParser(description="Rebuild the aggregate tables from the ledger")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user-id", type=int, help="Ledger to rebuild (required with FINANZAS_TENANCY=per_user)")
+    args = parser.parse_args()
+    if PER_USER_LEDGERS and args.user_id is None:
+        parser.error("--user-id is required with FINANZAS_TENANCY=per_user")
+
+    init_db()
+    db = ledger_session(args.user_id)
+    try:
+        rebuild_monthly_totals(db)
+        rebuild_daily_totals(db)
+        bump_data_version(db)
+        db.commit()
+        rows = db.query(MonthlyCategoryTotal).count()
+        print(f"✅ monthly_category_totals reconstruida: {rows} filas")
+        rows = db.query(DailyCategoryTotal).count()
+        print(f"✅ daily_category_totals reconstruida: {rows} filas")
+    finally:
+        db.close()
@@ -0,0 +1,200 @@
+"""
+Time series analytics over the ledger.
+
+A series is built from the compact `daily_category_totals` rollup (one row per
+day and (type, category), see aggregations.py) rather than from transactions:
+ten years of history are a few tens of thousands of (day, series, total) rows,
+read in one query. They are bucketed into a (series x period) matrix with a
+single bincount, and every column of the response (period totals, running
+balance, rolling averages, changes against the previous period) is a
+vectorized NumPy pass over that matrix.
+
+Periods are whole days, weeks (Monday to Sunday) or calendar months, so a range
+is widened to the boundaries of its first and last periods. The `window`
+periods before the range are read as well, so the rolling averages and the
+change of the first period are computed from real data instead of being cut
+short. The running balance starts from the running totals of every series on
+the day before that, so it is the balance of the whole ledger, not just of the
+range.
+"""
+from datetime import date
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import String, cast, func, select
+from sqlalchemy.orm import Session
+
+from .database import DailyCategoryTotal
+from .categories import get_category_map
+from .aggregations import running_totals_at, day_before
+
+GRANULARITIES = ("daily", "weekly", "monthly")
+
+# 1970-01-01, day 0 of datetime64[D], was a Thursday: day + 3 counts from a Monday
+_MONDAY_OFFSET = 3
+
+
+def period_numbers(days: np.ndarray, granularity: str) -> np.ndarray:
+    """Period of each datetime64[D] day, numbered from the epoch"""
+    if granularity == "daily":
+        return days.astype("int64")
+    if granularity == "weekly":
+        return (days.astype("int64") + _MONDAY_OFFSET) // 7
+    return days.astype("datetime64[M]").astype("int64")
+
+
+def period_starts(numbers: np.ndarray, granularity: str) -> np.ndarray:
+    """First day (datetime64[D]) of each period number"""
+    if granularity == "daily":
+        return numbers.astype("datetime64[D]")
+    if granularity == "weekly":
+        return (numbers * 7 - _MONDAY_OFFSET).astype("datetime64[D]")
+    return numbers.astype("datetime64[M]").astype("datetime64[D]")
+
+
+def _period_number(day: date, granularity: str) -> int:
+    return int(period_numbers(np.array([day], dtype="datetime64[D]"), granularity)[0])
+
+
+def _period_start(number: int, granularity: str) -> Optional[date]:
+    """First day of a period; None before year 1 or after year 9999, which `date` can't hold"""
+    day = period_starts(np.array([number], dtype="int64"), granularity)[0]
+    if not np.datetime64(date.min) <= day <= np.datetime64(date.max):
+        return None
+    return day.astype(date)
+
+
+def _round(values: np.ndarray) -> np.ndarray:
+    # Cumulative sums leave float noise; + 0.0 turns -0.0 into 0.0
+    return np.round(values, 2) + 0.0
+
+
+def count_periods(date_from: date, date_to: date, granularity: str) -> int:
+    """Periods touched by a range of days"""
+    return _period_number(date_to, granularity) - _period_number(date_from, granularity) + 1
+
+
+def last_periods_start(date_to: date, granularity: str, count: int) -> Optional[date]:
+    """First day of the last `count` periods up to the one holding date_to"""
+    return _period_start(_period_number(date_to, granularity) - count + 1, granularity)
+
+
+def _series_query(db: Session, first_day: Optional[date], end_day: Optional[date]):
+    """
+    One row per (type, category) with the days and totals of its daily rollup
+    rows in [first_day, end_day) (None = unbounded), each as one comma-separated
+    string: handing NumPy two strings per series is far cheaper than a Python
+    row per day.
+    """
+    filters = [DailyCategoryTotal.transaction_count > 0]
+    if first_day:
+        filters.append(DailyCategoryTotal.day >= first_day)
+    if end_day:
+        filters.append(DailyCategoryTotal.day < end_day)
+    if db.get_bind().dialect.name == "sqlite":
+        concat = func.group_concat
+    else:
+        concat = lambda column: func.string_agg(cast(column, String), ",")
+    return (
+        select(
+            DailyCategoryTotal.type,
+            DailyCategoryTotal.category_id,
+            concat(DailyCategoryTotal.day).label("days"),
+            concat(DailyCategoryTotal.total).label("amounts"),
+        )
+        .where(*filters)
+        .group_by(DailyCategoryTotal.type, DailyCategoryTotal.category_id)
+    )
+
+
+def empty_timeseries(granularity: str, window: int) -> dict:
+    """Time series without periods, for an empty ledger or a range outside it"""
+    return {
+        "granularity": granularity,
+        "window": window,
+        "periods": [],
+        "income": [],
+        "expenses": [],
+        "net": [],
+        "running_balance": [],
+        "income_change": [],
+        "expenses_change": [],
+        "net_change": [],
+        "categories": [],
+    }
+
+
+def build_timeseries(db: Session, granularity: str, window: int, date_from: date, date_to: date) -> dict:
+    """Column-oriented time series: a TimeseriesResponse as a dict of lists and arrays"""
+    result = empty_timeseries(granularity, window)
+
+    # `window` extra periods before the range: window - 1 for the first rolling
+    # average and one for the first change
+    first_period = _period_number(date_from, granularity) - window
+    last_period = _period_number(date_to, granularity)
+    periods = last_period - first_period + 1
+    # None past either end of the calendar: those periods hold no transactions
+    first_day = _period_start(first_period, granularity)
+    end_day = _period_start(last_period + 1, granularity)
+
+    opening = running_totals_at(db, [day_before(first_day) if first_day else None])
+    # Only "ingreso" and "gasto" count, as in the financial summary
+    sign = {"ingreso": 1, "gasto": -1}
+    opening_balance = sum(
+        sign.get(trans_type, 0) * totals[0][0] for (trans_type, _), totals in opening.items()
+    )
+
+    series = db.execute(_series_query(db, first_day, end_day)).all()
+    series_types = [row.type for row in series]
+    series_ids = [row.category_id for row in series]
+    if series:
+        days = np.array(",".join(row.days for row in series).split(","), dtype="datetime64[D]")
+        amounts = np.array(",".join(row.amounts for row in series).split(","), dtype=float)
+        lengths = [row.days.count(",") + 1 for row in series]
+        index = np.repeat(np.arange(len(series)), lengths) * periods
+        index += period_numbers(days, granularity) - first_period
+        totals = np.bincount(index, weights=amounts, minlength=len(series) * periods)
+        totals = totals.reshape(len(series), periods)
+    else:
+        totals = np.zeros((0, periods))
+
+    is_income = np.array([trans_type == "ingreso" for trans_type in series_types], dtype=bool)
+    is_expense = np.array([trans_type == "gasto" for trans_type in series_types], dtype=bool)
+    income = totals[is_income].sum(axis=0)
+    expenses = totals[is_expense].sum(axis=0)
+    net = income - expenses
+    running_balance = opening_balance + np.cumsum(net)
+
+    # Trailing mean of `window` periods: differences of the cumulative sums
+    cumulative = np.concatenate([np.zeros((len(series), 1)), np.cumsum(totals, axis=1)], axis=1)
+    rolling = (cumulative[:, window:] - cumulative[:, :-window]) / window
+
+    shown = slice(window, None)
+    starts = period_starts(np.arange(first_period + window, last_period + 1), granularity)
+    result.update(
+        periods=starts.astype(str).tolist(),
+        income=_round(income[shown]),
+        expenses=_round(expenses[shown]),
+        net=_round(net[shown]),
+        running_balance=_round(running_balance[shown]),
+        income_change=_round(np.diff(income)[window - 1:]),
+        expenses_change=_round(np.diff(expenses)[window - 1:]),
+        net_change=_round(np.diff(net)[window - 1:]),
+    )
+
+    categories = get_category_map(db)
+    series_totals = totals[:, shown].sum(axis=1)
+    for i in np.lexsort((-series_totals, ~is_income)):
+        if not (is_income[i] or is_expense[i]):
+            continue
+        if not series_totals[i] and not rolling[i, 1:].any():
+            continue
+        category = categories.get(series_ids[i])
+        result["categories"].append({
+            "category_id": series_ids[i],
+            "category_name": category.name if category else "Sin categoría",
+            "type": series_types[i],
+            "totals": _round(totals[i, shown]),
+            "rolling_average": _round(rolling[i, 1:]),
+        })
+    return result
@@ -0,0 +1,268 @@
+"""
+Async variants of the financial routes, mounted instead of `financial_routes`
+when FINANZAS_ASYNC_DB=1.
+
+Each handler awaits an AsyncSession (aiosqlite) and runs the same route logic
+from `financial_routes` through `AsyncSession.run_sync`, so queries and
+responses are identical while database waits no longer occupy a threadpool
+slot. The CSV/NDJSON export keeps its sync implementation because it streams
+from the session after the handler has returned.
+"""
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, Query
+
+from . import financial_routes as routes
+from .database import get_async_db
+from .auth import get_current_user_async
+from .models import (
+    TransactionCreate, TransactionUpdate, TransactionResponse,
+    TransactionBulkResponse, CategoryResponse, BudgetCreate, BudgetResponse,
+    SavingsGoalCreate, SavingsGoalUpdate, SavingsGoalResponse,
+    FinancialSummary, MonthlySummary, TimeseriesResponse
+)
+
+router = APIRouter(prefix="/api/financial", tags=["financial"])
+
+
+# ============ CATEGORIES ============
+@router.get("/categories", response_model=List[CategoryResponse])
+async def get_categories(
+    type: str = None,
+    if_none_match: Optional[str] = Header(None),
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Get all categories, optionally filtered by type"""
+    return await db.run_sync(
+        lambda session: routes.get_categories(
+            type=type, if_none_match=if_none_match, db=session, current_user=current_user
+        )
+    )
+
+
+# ============ TRANSACTIONS ============
+@router.post("/transactions", response_model=TransactionResponse)
+async def create_transaction(
+    transaction: TransactionCreate,
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Create a new transaction"""
+    return await db.run_sync(
+        lambda session: routes.create_transaction(transaction, db=session, current_user=current_user)
+    )
+
+
+@router.post("/transactions/bulk", response_model=TransactionBulkResponse)
+async def create_transactions_bulk(
+    transactions: List[TransactionCreate],
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Create many transactions in a single database transaction"""
+    return await db.run_sync(
+        lambda session: routes.create_transactions_bulk(transactions, db=session, current_user=current_user)
+    )
+
+
+@router.get("/transactions", response_model=List[TransactionResponse])
+async def get_transactions(
+    month: int = None,
+    year: int = None,
+    type: str = None,
+    category_id: int = None,
+    limit: int = Query(100, ge=1, le=routes.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    if_none_match: Optional[str] = Header(None),
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Get transactions with optional filters, newest first (see X-Next-Cursor)"""
+    return await db.run_sync(
+        lambda session: routes.get_transactions(
+            month=month, year=year, type=type, category_id=category_id, limit=limit,
+            cursor=cursor, fields=fields, date_from=date_from, date_to=date_to,
+            if_none_match=if_none_match, db=session, current_user=current_user
+        )
+    )
+
+
+router.add_api_route("/transactions/export", routes.export_transactions, methods=["GET"])
+
+
+@router.get("/transactions/search", response_model=List[TransactionResponse])
+async def search_transactions(
+    q: str,
+    month: int = None,
+    year: int = None,
+    type: str = None,
+    category_id: int = None,
+    limit: int = Query(50, ge=1, le=routes.MAX_SEARCH_RESULTS),
+    if_none_match: Optional[str] = Header(None),
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Search descriptions and notes, best matches first"""
+    return await db.run_sync(
+        lambda session: routes.search_transactions(
+            q, month=month, year=year, type=type, category_id=category_id, limit=limit,
+            if_none_match=if_none_match, db=session, current_user=current_user
+        )
+    )
+
+
+@router.put("/transactions/{transaction_id}", response_model=TransactionResponse)
+async def update_transaction(
+    transaction_id: int,
+    transaction: TransactionUpdate,
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Update a transaction"""
+    return await db.run_sync(
+        lambda session: routes.update_transaction(
+            transaction_id, transaction, db=session, current_user=current_user
+        )
+    )
+
+
+@router.delete("/transactions/{transaction_id}")
+async def delete_transaction(
+    transaction_id: int,
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Delete a transaction"""
+    return await db.run_sync(
+        lambda session: routes.delete_transaction(transaction_id, db=session, current_user=current_user)
+    )
+
+
+# ============ SUMMARIES ============
+@router.get("/summary", response_model=FinancialSummary)
+async def get_financial_summary(
+    month: int = None,
+    year: int = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    if_none_match: Optional[str] = Header(None),
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Get financial summary with income/expense breakdown by category (month/year or from/to)"""
+    return await db.run_sync(
+        lambda session: routes.get_financial_summary(
+            month=month, year=year, date_from=date_from, date_to=date_to,
+            if_none_match=if_none_match, db=session, current_user=current_user
+        )
+    )
+
+
+@router.get("/summary/monthly", response_model=List[MonthlySummary])
+async def get_monthly_summaries(
+    year: Optional[int] = None,
+    years: Optional[List[int]] = Query(None),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    if_none_match: Optional[str] = Header(None),
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Get monthly summaries for a year, several years (?years=) or a range of days (?from=&to=)"""
+    return await db.run_sync(
+        lambda session: routes.get_monthly_summaries(
+            year=year, years=years, date_from=date_from, date_to=date_to,
+            if_none_match=if_none_match, db=session, current_user=current_user
+        )
+    )
+
+
+# ============ ANALYTICS ============
+@router.get("/analytics/timeseries", response_model=TimeseriesResponse)
+async def get_timeseries(
+    granularity: str = "monthly",
+    window: int = Query(3, ge=1, le=routes.MAX_ROLLING_WINDOW),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    if_none_match: Optional[str] = Header(None),
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Running balance, rolling category averages and period changes per day, week or month"""
+    return await db.run_sync(
+        lambda session: routes.get_timeseries(
+            granularity=granularity, window=window, date_from=date_from, date_to=date_to,
+            if_none_match=if_none_match, db=session, current_user=current_user
+        )
+    )
+
+
+# ============ BUDGETS ============
+@router.post("/budgets", response_model=BudgetResponse)
+async def create_budget(
+    budget: BudgetCreate,
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Create a budget for a category"""
+    return await db.run_sync(
+        lambda session: routes.create_budget(budget, db=session, current_user=current_user)
+    )
+
+
+@router.get("/budgets", response_model=List[BudgetResponse])
+async def get_budgets(
+    month: int,
+    year: int,
+    if_none_match: Optional[str] = Header(None),
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Get budgets for a specific month"""
+    return await db.run_sync(
+        lambda session: routes.get_budgets(
+            month, year, if_none_match=if_none_match, db=session, current_user=current_user
+        )
+    )
+
+
+# ============ SAVINGS GOALS ============
+@router.post("/savings-goals", response_model=SavingsGoalResponse)
+async def create_savings_goal(
+    goal: SavingsGoalCreate,
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Create a savings goal"""
+    return await db.run_sync(
+        lambda session: routes.create_savings_goal(goal, db=session, current_user=current_user)
+    )
+
+
+@router.get("/savings-goals", response_model=List[SavingsGoalResponse])
+async def get_savings_goals(
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Get all savings goals"""
+    return await db.run_sync(
+        lambda session: routes.get_savings_goals(db=session, current_user=current_user)
+    )
+
+
+@router.put("/savings-goals/{goal_id}", response_model=SavingsGoalResponse)
+async def update_savings_goal(
+    goal_id: int,
+    update: SavingsGoalUpdate,
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user_async)
+):
+    """Update savings goal progress"""
+    return await db.run_sync(
+        lambda session: routes.update_savings_goal(goal_id, update, db=session, current_user=current_user)
+    )
@@ -1,21 +1,110 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
+import os
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, select
 from sqlalchemy.orm import Session
-from .database import get_db, User
+from .database import get_db, get_async_db, User
 
 # Security configuration
 SECRET_KEY = "tu-clave-secreta-super-segura-cambiala-en-produccion-12345"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# Verified-token cache: skips the JWT decode and the user query for tokens
+# seen recently. Entries live until the token's own `exp` or the TTL, whichever
+# comes first, and are dropped when the user row changes.
+TOKEN_CACHE_SIZE = int(os.getenv("FINANZAS_TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("FINANZAS_TOKEN_CACHE_TTL", "300"))
+
+# When enabled, a token carrying the user name in its claims is trusted without
+# looking the user up at all (a deleted user stays valid until the token expires)
+TRUST_TOKEN_CLAIMS = os.getenv("FINANZAS_TRUST_TOKEN_CLAIMS", "0").lower() in ("1", "true", "yes")
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 
+class TokenCache:
+    """Bounded LRU of token -> user fields, with per-entry expiry"""
+
+    def __init__(self, maxsize: int, ttl_seconds: int):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # token -> (expires_at, user fields)
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, user_fields = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return user_fields
+
+    def put(self, token: str, user_fields: dict, token_exp: Optional[float]):
+        expires_at = time.time() + self.ttl_seconds
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._entries[token] = (expires_at, user_fields)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in [
+                token for token, (_, fields) in self._entries.items()
+                if fields["id"] == user_id
+            ]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id: int):
+    """Forget cached tokens of a user, e.g. after changing or deleting it"""
+    token_cache.invalidate_user(user_id)
+
+
+# Drop cached tokens once a change to a user row is committed
+def _mark_user_changed(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+for _event_name in ("after_update", "after_delete"):
+    event.listen(User, _event_name, _mark_user_changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_users_after_commit(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_users_after_rollback(session):
+    session.info.pop("changed_user_ids", None)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -33,28 +122,78 @@ def verify_access_code(access_code: str, db: Session) -> Optional[User]:
     return user
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current user from JWT token"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _decode_token(token: str) -> dict:
+    """Verify the JWT and return its claims; `sub` (the user id) is required"""
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
+        if payload.get("sub") is None:
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    return payload
+
+
+def _user_fields(user: User) -> dict:
+    return {
+        "id": user.id,
+        "access_code": user.access_code,
+        "name": user.name,
+        "created_at": user.created_at,
+    }
+
+
+def _user_from_claims(payload: dict) -> Optional[User]:
+    """Build the user straight from the token when its claims are trusted"""
+    if TRUST_TOKEN_CLAIMS and payload.get("name") is not None:
+        return User(id=int(payload["sub"]), name=payload["name"])
+    return None
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get current user from JWT token"""
+    token = credentials.credentials
+    cached = token_cache.get(token)
+    if cached is not None:
+        return User(**cached)
+    
+    payload = _decode_token(token)
+    user = _user_from_claims(payload)
+    if user is None:
+        user = db.query(User).filter(User.id == payload["sub"]).first()
+        if user is None:
+            raise _credentials_exception()
+    
+    token_cache.put(token, _user_fields(user), payload.get("exp"))
+    return user
+
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db = Depends(get_async_db)
+) -> User:
+    """Async variant of get_current_user for routes using an AsyncSession"""
+    token = credentials.credentials
+    cached = token_cache.get(token)
+    if cached is not None:
+        return User(**cached)
     
-    user = db.query(User).filter(User.id == user_id).first()
+    payload = _decode_token(token)
+    user = _user_from_claims(payload)
     if user is None:
-        raise credentials_exception
+        user = (await db.execute(select(User).where(User.id == payload["sub"]))).scalar_one_or_none()
+        if user is None:
+            raise _credentials_exception()
     
+    token_cache.put(token, _user_fields(user), payload.get("exp"))
     return user
@@ -0,0 +1,94 @@
+"""
+Concurrency benchmark for the financial API.
+
+Fires GET requests against a running server at several concurrency levels and
+reports throughput and latency. Run it once against a server started normally
+and once against a server started with FINANZAS_ASYNC_DB=1 to compare the sync
+and async database layers:
+
+    uvicorn backend.main:app --port 8000
+    FINANZAS_ASYNC_DB=1 uvicorn backend.main:app --port 8001
+
+    python -m backend.benchmark_concurrency --url http://localhost:8000
+    python -m backend.benchmark_concurrency --url http://localhost:8001
+
+Requires httpx (pip install httpx), which is not a runtime dependency.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+ENDPOINTS = [
+    "/api/financial/summary",
+    "/api/financial/summary/monthly?year=2026",
+    "/api/financial/transactions?limit=50",
+    "/api/financial/budgets?month=1&year=2026",
+]
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, total_requests: int):
+    """Send total_requests requests with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.get(ENDPOINTS[i % len(ENDPOINTS)])
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "throughput": total_requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main(url: str, access_code: str, levels, total_requests: int):
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        login = await client.post("/api/auth/login", json={"access_code": access_code})
+        login.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+
+        # Warm up connections and the category registry
+        await run_level(client, 10, 50)
+
+        print(f"{'clients':>8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for level in levels:
+            result = await run_level(client, level, total_requests)
+            print(
+                f"{result['concurrency']:>8} {result['requests']:>9} {result['errors']:>7} "
+                f"{result['throughput']:>9.1f} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrency benchmark for the financial API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--access-code", default="FINANZAS2026")
+    parser.add_argument("--levels", default="50,200", help="Comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per level")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    asyncio.run(main(args.url, args.access_code, levels, args.requests))
@@ -0,0 +1,86 @@
+"""
+Process-wide category registry.
+
+Categories are a small table that almost every financial route needs in order
+to decorate its rows (name, color, icon). Instead of querying them row by row,
+they are loaded once into memory and served from there until a session commits
+an insert, update or delete on the categories table. With per-user ledgers
+(tenancy.py) each ledger has its own registry.
+"""
+import threading
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .database import Category, session_tenant
+
+
+class CategoryInfo(NamedTuple):
+    """Immutable snapshot of a category row, safe to share between requests"""
+    id: int
+    name: str
+    type: str
+    color: str
+    icon: str
+
+
+_lock = threading.Lock()
+# Keyed by tenant (None for the shared database)
+_registries: Dict[Optional[int], Dict[int, CategoryInfo]] = {}
+_generations: Dict[Optional[int], int] = {}
+
+
+def get_category_map(db: Session) -> Dict[int, CategoryInfo]:
+    """Return every category keyed by id, loading them on first use"""
+    tenant = session_tenant(db)
+    registry = _registries.get(tenant)
+    if registry is not None:
+        return registry
+
+    generation = _generations.get(tenant, 0)
+    rows = db.query(
+        Category.id, Category.name, Category.type, Category.color, Category.icon
+    ).all()
+    registry = {row.id: CategoryInfo(*row) for row in rows}
+
+    with _lock:
+        # Don't publish a snapshot that was read while a change was committed
+        if generation == _generations.get(tenant, 0):
+            _registries[tenant] = registry
+    return registry
+
+
+def get_category(db: Session, category_id: int) -> Optional[CategoryInfo]:
+    """Resolve a single category id, or None if it doesn't exist"""
+    return get_category_map(db).get(category_id)
+
+
+def invalidate_categories(tenant: Optional[int] = None):
+    """Drop the in-memory registry of a ledger so the next lookup reloads it"""
+    with _lock:
+        _registries.pop(tenant, None)
+        _generations[tenant] = _generations.get(tenant, 0) + 1
+
+
+# Invalidation: mark the session when a category is flushed and drop the
+# registry once that change is actually committed.
+def _mark_categories_changed(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info["categories_changed"] = True
+
+
+for _event_name in ("after_insert", "after_update", "after_delete"):
+    event.listen(Category, _event_name, _mark_categories_changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("categories_changed", False):
+        invalidate_categories(session_tenant(session))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop("categories_changed", None)
@@ -1,19 +1,93 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Enum
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey, Enum, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship
+from sqlalchemy.pool import QueuePool
 from datetime import datetime
+from typing import Optional
 import enum
+import os
+
+# Database connection (SQLite by default), configurable through the environment
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./finanzas.db")
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+
+# Connection pool sizing, shared by the sync and async engines
+DB_POOL_SIZE = int(os.getenv("FINANZAS_DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("FINANZAS_DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("FINANZAS_DB_POOL_TIMEOUT", "30"))  # seconds
+
+# SQLite performance profile, applied to every new connection. WAL lets readers
+# run while a write is in progress and synchronous=NORMAL is durable in WAL mode.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("FINANZAS_SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("FINANZAS_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.getenv("FINANZAS_SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB (64 MB)
+    "mmap_size": int(os.getenv("FINANZAS_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),  # bytes
+    "temp_store": os.getenv("FINANZAS_SQLITE_TEMP_STORE", "MEMORY"),
+    "busy_timeout": int(os.getenv("FINANZAS_SQLITE_BUSY_TIMEOUT", "5000")),  # ms
+}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _engine_options():
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    if IS_SQLITE:
+        options["connect_args"] = {"check_same_thread": False}
+    return options
 
-# SQLite database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./finanzas.db"
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, poolclass=QueuePool, **_engine_options()
 )
+if IS_SQLITE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional async engine (AsyncSession over aiosqlite), enabled with
+# FINANZAS_ASYNC_DB=1. The API then serves the financial routes without
+# holding a threadpool slot while waiting on the database.
+USE_ASYNC_DB = os.getenv("FINANZAS_ASYNC_DB", "0").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+async_engine = None
+AsyncSessionLocal = None
+if USE_ASYNC_DB:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+    
+    # aiosqlite defaults to NullPool, which opens a connection (and its
+    # worker thread) per request; keep a pool of open connections instead
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool, **_engine_options()
+    )
+    if IS_SQLITE:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
 Base = declarative_base()
 
+# Session.info key holding the user whose own ledger file a session is bound
+# to (see tenancy.py); absent for sessions on the shared database
+TENANT_INFO_KEY = "tenant_id"
+
+
+def session_tenant(db) -> Optional[int]:
+    """User whose ledger a session is bound to, or None for the shared database"""
+    return db.info.get(TENANT_INFO_KEY)
+
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -23,6 +97,11 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 class TransactionType(str, enum.Enum):
     INGRESO = "ingreso"
     GASTO = "gasto"
@@ -51,6 +130,13 @@ class Category(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Back the filtered, (date, id)-ordered keyset pagination of the list endpoint
+        Index("ix_transactions_year_month_date_id", "year", "month", "date", "id"),
+        Index("ix_transactions_category_date_id", "category_id", "date", "id"),
+        # Date-range listings (?from=&to=) without a month/year filter
+        Index("ix_transactions_date_id", "date", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String, index=True)
@@ -68,6 +154,9 @@ class Transaction(Base):
 
 class Budget(Base):
     __tablename__ = "budgets"
+    __table_args__ = (
+        Index("uq_budgets_category_month_year", "category_id", "month", "year", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     category_id = Column(Integer, ForeignKey("categories.id"))
@@ -79,6 +168,83 @@ class Budget(Base):
     category = relationship("Category")
 
 
+class MonthlyCategoryTotal(Base):
+    """Materialized totals per (year, month, type, category), kept in sync by the write routes"""
+    __tablename__ = "monthly_category_totals"
+    __table_args__ = (
+        UniqueConstraint("year", "month", "type", "category_id", name="uq_monthly_category_totals_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)  # 1-12
+    type = Column(String, nullable=False)  # "ingreso" or "gasto"
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    total = Column(Float, nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+
+class DailyCategoryTotal(Base):
+    """
+    Totals per (day, type, category) plus running totals over every earlier day
+    of the same (type, category), so any date range costs two lookups per series
+    """
+    __tablename__ = "daily_category_totals"
+    __table_args__ = (
+        UniqueConstraint("type", "category_id", "day", name="uq_daily_category_totals_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    type = Column(String, nullable=False)  # "ingreso" or "gasto"
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    total = Column(Float, nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    cum_total = Column(Float, nullable=False, default=0)  # total up to and including `day`
+    cum_count = Column(Integer, nullable=False, default=0)
+
+
+class DataVersion(Base):
+    """Single-row counter bumped by every write, used for ETags and the response cache"""
+    __tablename__ = "data_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class ImportStaging(Base):
+    """Rows parsed from Excel workbooks, merged into transactions in one step by the importer"""
+    __tablename__ = "import_staging"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(String, nullable=False, index=True)
+    source_file = Column(String, nullable=False)
+    description = Column(String)
+    amount = Column(Float)
+    type = Column(String)  # "ingreso" or "gasto"
+    category_id = Column(Integer, ForeignKey("categories.id"))
+    date = Column(DateTime)
+    month = Column(Integer)  # 1-12
+    year = Column(Integer)
+    notes = Column(String, nullable=True)
+
+
+class ImportLog(Base):
+    """Fingerprint of each imported (workbook, sheet), used to skip unchanged sheets on re-import"""
+    __tablename__ = "import_log"
+    __table_args__ = (
+        UniqueConstraint("workbook", "sheet", name="uq_import_log_workbook_sheet"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    workbook = Column(String, nullable=False)  # absolute path
+    sheet = Column(String, nullable=False)
+    year = Column(Integer, nullable=False)
+    workbook_hash = Column(String, nullable=False)  # SHA-256 of the whole file
+    content_hash = Column(String, nullable=False)  # SHA-256 of the rows the sheet contributes
+    imported_at = Column(DateTime, default=datetime.utcnow)
+
+
 class SavingsGoal(Base):
     __tablename__ = "savings_goals"
     
@@ -91,11 +257,22 @@ class SavingsGoal(Base):
     completed = Column(Boolean, default=False)
 
 
-def init_db():
-    """Initialize database and create default categories"""
-    Base.metadata.create_all(bind=engine)
+def init_ledger(bind, tenant_id: Optional[int] = None):
+    """Create the ledger tables (everything but users) on an engine and seed the default categories"""
+    ledger_tables = [table for table in Base.metadata.sorted_tables if table.name != User.__tablename__]
+    Base.metadata.create_all(bind=bind, tables=ledger_tables)
     
-    db = SessionLocal()
+    # create_all skips tables that already exist, so add indexes introduced later
+    for table in ledger_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    
+    # Full-text index over descriptions and notes (SQLite FTS5)
+    if bind.dialect.name == "sqlite":
+        from .search import ensure_search_index
+        ensure_search_index(bind)
+    
+    db = Session(bind=bind, info={TENANT_INFO_KEY: tenant_id} if tenant_id is not None else {})
     
     # Check if categories already exist
     if db.query(Category).count() == 0:
@@ -124,6 +301,30 @@ def init_db():
         db.add_all(income_categories + expense_categories)
         db.commit()
     
+    if db.query(DataVersion).count() == 0:
+        db.add(DataVersion(id=1, version=0))
+        db.commit()
+    
+    # Backfill the aggregate tables for databases created before they existed
+    from .aggregations import rebuild_monthly_totals, rebuild_daily_totals
+    for model, rebuild in (
+        (MonthlyCategoryTotal, rebuild_monthly_totals),
+        (DailyCategoryTotal, rebuild_daily_totals),
+    ):
+        if db.query(model).count() == 0 and db.query(Transaction).count() > 0:
+            rebuild(db)
+            db.commit()
+    
+    db.close()
+
+
+def init_db():
+    """Initialize database and create default categories"""
+    Base.metadata.create_all(bind=engine)
+    init_ledger(engine)
+    
+    db = SessionLocal()
+    
     # Create default user if doesn't exist
     if db.query(User).count() == 0:
         default_user = User(access_code="FINANZAS2026", name="Usuario")
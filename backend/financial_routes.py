@@ -1,69 +1,175 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from typing import List
-from datetime import datetime
+from sqlalchemy import func, extract, delete, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
+from datetime import date, datetime, time
+import csv
+import io
+import json
 
-from .database import get_db, Transaction, Category, Budget, SavingsGoal
+from .database import Transaction, Category, Budget, SavingsGoal
 from .auth import get_current_user
+from .tenancy import get_ledger_db
+from .categories import get_category, get_category_map
+from .pagination import encode_cursor, decode_cursor
+from .response_cache import bump_data_version, cached_json_response
+from .search import search_terms, ranked_matches, like_filters
+from .analytics import (
+    GRANULARITIES, build_timeseries, empty_timeseries, count_periods, last_periods_start
+)
+from .aggregations import (
+    category_totals_query, build_financial_summary,
+    monthly_category_totals_query, build_monthly_summaries,
+    budgets_with_spent_query, build_budget_response,
+    range_category_totals, range_monthly_totals, daily_totals_bounds,
+    LEDGER_COLUMNS, ledger_entry, update_ledger_totals
+)
 from .models import (
     TransactionCreate, TransactionUpdate, TransactionResponse,
+    BulkItemResult, TransactionBulkResponse,
     CategoryResponse, BudgetCreate, BudgetResponse,
     SavingsGoalCreate, SavingsGoalUpdate, SavingsGoalResponse,
-    FinancialSummary, CategorySummary, MonthlySummary
+    FinancialSummary, MonthlySummary, TimeseriesResponse
 )
 
 router = APIRouter(prefix="/api/financial", tags=["financial"])
 
+# Upper bound on items accepted by POST /transactions/bulk
+MAX_BULK_TRANSACTIONS = 10000
+
+# Rows fetched per round trip while streaming an export
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = (
+    "id", "date", "description", "amount", "type", "category_id",
+    "category_name", "month", "year", "notes", "created_at"
+)
+
+# Upper bound on ?limit= of a transactions page
+MAX_PAGE_SIZE = 1000
+
+# Upper bound on ?limit= of the search endpoint
+MAX_SEARCH_RESULTS = 500
+
+# Upper bounds on periods returned by /analytics/timeseries and on its rolling window
+MAX_TIMESERIES_PERIODS = 5000
+MAX_ROLLING_WINDOW = 366
+
+# Columns of a TransactionResponse, selectable with ?fields= on the list endpoint
+TRANSACTION_COLUMNS = {
+    "id": Transaction.id,
+    "description": Transaction.description,
+    "amount": Transaction.amount,
+    "type": Transaction.type,
+    "category_id": Transaction.category_id,
+    "category_name": func.coalesce(Category.name, "Sin categoría"),
+    "category_color": func.coalesce(Category.color, "#gray"),
+    "category_icon": func.coalesce(Category.icon, "💰"),
+    "date": Transaction.date,
+    "month": Transaction.month,
+    "year": Transaction.year,
+    "notes": Transaction.notes,
+    "created_at": Transaction.created_at,
+}
+
+
+def _parse_date(value: str) -> datetime:
+    """Parse an ISO date string, accepting both 'YYYY-MM-DD' and 'YYYY-MM-DDTHH:MM:SS'"""
+    date_str = value.split('T')[0]  # Get just the date part
+    return datetime.strptime(date_str, '%Y-%m-%d')
+
+
+def _check_date_range(date_from: Optional[date], date_to: Optional[date]):
+    """Reject ?from= later than ?to="""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="Rango de fechas inválido: from es posterior a to")
+
+
+def _transaction_filters(
+    month: int = None,
+    year: int = None,
+    type: str = None,
+    category_id: int = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+):
+    """WHERE clauses shared by the transaction list, export and search endpoints"""
+    filters = []
+    if month:
+        filters.append(Transaction.month == month)
+    if year:
+        filters.append(Transaction.year == year)
+    if type:
+        filters.append(Transaction.type == type)
+    if category_id:
+        filters.append(Transaction.category_id == category_id)
+    # Both ends are whole days, inclusive
+    if date_from:
+        filters.append(Transaction.date >= datetime.combine(date_from, time.min))
+    if date_to:
+        filters.append(Transaction.date <= datetime.combine(date_to, time.max))
+    return filters
+
+
+def _transaction_response(trans: Transaction, category) -> TransactionResponse:
+    """Build a TransactionResponse from a transaction and its (optional) category"""
+    return TransactionResponse(
+        id=trans.id,
+        description=trans.description,
+        amount=trans.amount,
+        type=trans.type,
+        category_id=trans.category_id,
+        category_name=category.name if category else "Sin categoría",
+        category_color=category.color if category else "#gray",
+        category_icon=category.icon if category else "💰",
+        date=trans.date,
+        month=trans.month,
+        year=trans.year,
+        notes=trans.notes,
+        created_at=trans.created_at
+    )
+
 
 # ============ CATEGORIES ============
 @router.get("/categories", response_model=List[CategoryResponse])
 def get_categories(
     type: str = None,
-    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
     """Get all categories, optionally filtered by type"""
-    query = db.query(Category)
-    if type:
-        query = query.filter(Category.type == type)
-    return query.all()
+    def build():
+        categories = get_category_map(db).values()
+        if type:
+            return [cat._asdict() for cat in categories if cat.type == type], {}
+        return [cat._asdict() for cat in categories], {}
+    
+    return cached_json_response(db, "categories", (type,), if_none_match, build)
 
 
 # ============ TRANSACTIONS ============
 @router.post("/transactions", response_model=TransactionResponse)
 def create_transaction(
     transaction: TransactionCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
     """Create a new transaction"""
-    # Debug logging
-    print(f"=== CREATE TRANSACTION DEBUG ===")
-    print(f"Received data: {transaction}")
-    print(f"Date field: {transaction.date}")
-    print(f"Date type: {type(transaction.date)}")
-    
     # Get category
-    category = db.query(Category).filter(Category.id == transaction.category_id).first()
+    category = get_category(db, transaction.category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     
     # Parse date from string
     if transaction.date:
-        # Parse ISO date string (YYYY-MM-DD)
         try:
-            # Handle both 'YYYY-MM-DD' and 'YYYY-MM-DDTHH:MM:SS' formats
-            date_str = transaction.date.split('T')[0]  # Get just the date part
-            trans_date = datetime.strptime(date_str, '%Y-%m-%d')
-            print(f"Parsed date: {trans_date}")
-            print(f"Month: {trans_date.month}, Year: {trans_date.year}")
-        except (ValueError, AttributeError) as e:
+            trans_date = _parse_date(transaction.date)
+        except (ValueError, AttributeError):
             # If parsing fails, use current date
-            print(f"Date parsing error: {e}, using current date")
             trans_date = datetime.utcnow()
     else:
-        print("No date provided, using current date")
         trans_date = datetime.utcnow()
     
     # Create transaction
@@ -79,24 +185,87 @@ def create_transaction(
     )
     
     db.add(db_transaction)
+    update_ledger_totals(db, added=[ledger_entry(db_transaction)])
+    bump_data_version(db)
     db.commit()
     db.refresh(db_transaction)
     
     # Return with category info
-    return TransactionResponse(
-        id=db_transaction.id,
-        description=db_transaction.description,
-        amount=db_transaction.amount,
-        type=db_transaction.type,
-        category_id=db_transaction.category_id,
-        category_name=category.name,
-        category_color=category.color,
-        category_icon=category.icon,
-        date=db_transaction.date,
-        month=db_transaction.month,
-        year=db_transaction.year,
-        notes=db_transaction.notes,
-        created_at=db_transaction.created_at
+    return _transaction_response(db_transaction, category)
+
+
+@router.post("/transactions/bulk", response_model=TransactionBulkResponse)
+def create_transactions_bulk(
+    transactions: List[TransactionCreate],
+    db: Session = Depends(get_ledger_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Create many transactions in a single database transaction.
+    
+    Items with an unknown category or an invalid date are reported as errors
+    and skipped; the rest are inserted with one executemany and one commit.
+    Results are returned in the same order as the request items.
+    """
+    if len(transactions) > MAX_BULK_TRANSACTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Máximo {MAX_BULK_TRANSACTIONS} transacciones por solicitud"
+        )
+    
+    categories = get_category_map(db)
+    now = datetime.utcnow()
+    
+    results = [None] * len(transactions)
+    rows = []
+    row_indexes = []
+    for index, transaction in enumerate(transactions):
+        if transaction.category_id not in categories:
+            results[index] = BulkItemResult(index=index, status="error", detail="Categoría no encontrada")
+            continue
+        if transaction.date:
+            try:
+                trans_date = _parse_date(transaction.date)
+            except (ValueError, AttributeError):
+                results[index] = BulkItemResult(
+                    index=index, status="error", detail="Formato de fecha inválido. Use YYYY-MM-DD"
+                )
+                continue
+        else:
+            trans_date = now
+        
+        rows.append({
+            "description": transaction.description,
+            "amount": transaction.amount,
+            "type": transaction.type,
+            "category_id": transaction.category_id,
+            "date": trans_date,
+            "month": trans_date.month,
+            "year": trans_date.year,
+            "notes": transaction.notes,
+            "created_at": now,
+        })
+        row_indexes.append(index)
+    
+    if rows:
+        new_ids = db.scalars(
+            insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+            rows
+        ).all()
+        update_ledger_totals(db, added=[
+            (row["year"], row["month"], row["type"], row["category_id"], row["amount"], row["date"].date())
+            for row in rows
+        ])
+        bump_data_version(db)
+        db.commit()
+        
+        for index, new_id in zip(row_indexes, new_ids):
+            results[index] = BulkItemResult(index=index, status="created", id=new_id)
+    
+    return TransactionBulkResponse(
+        created=len(rows),
+        failed=len(transactions) - len(rows),
+        results=results
     )
 
 
@@ -106,58 +275,210 @@ def get_transactions(
     year: int = None,
     type: str = None,
     category_id: int = None,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
-    """Get transactions with optional filters"""
-    query = db.query(Transaction)
+    """
+    Get transactions with optional filters, newest first.
+    
+    Pages are keyset-paginated: when more rows exist, the `X-Next-Cursor`
+    response header holds the cursor to pass back as `?cursor=` for the next page.
+    `?fields=id,date,amount` returns only those columns of each transaction.
+    `?from=2026-01-01&to=2026-03-31` limits them to a range of days (inclusive).
+    """
+    _check_date_range(date_from, date_to)
+    if fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in selected if name not in TRANSACTION_COLUMNS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Campo desconocido: {unknown[0]}")
+        # Keep request order, drop repeats
+        selected = list(dict.fromkeys(selected))
+    else:
+        selected = list(TRANSACTION_COLUMNS)
     
-    if month:
-        query = query.filter(Transaction.month == month)
-    if year:
-        query = query.filter(Transaction.year == year)
-    if type:
-        query = query.filter(Transaction.type == type)
-    if category_id:
-        query = query.filter(Transaction.category_id == category_id)
-    
-    transactions = query.order_by(Transaction.date.desc()).limit(limit).all()
-    
-    # Build response with category info
-    result = []
-    for trans in transactions:
-        category = db.query(Category).filter(Category.id == trans.category_id).first()
-        result.append(TransactionResponse(
-            id=trans.id,
-            description=trans.description,
-            amount=trans.amount,
-            type=trans.type,
-            category_id=trans.category_id,
-            category_name=category.name if category else "Sin categoría",
-            category_color=category.color if category else "#gray",
-            category_icon=category.icon if category else "💰",
-            date=trans.date,
-            month=trans.month,
-            year=trans.year,
-            notes=trans.notes,
-            created_at=trans.created_at
-        ))
-    
-    return result
+    filters = _transaction_filters(month, year, type, category_id, date_from, date_to)
+    if cursor:
+        try:
+            cursor_date, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+        filters.append(tuple_(Transaction.date, Transaction.id) < (cursor_date, cursor_id))
+    
+    def build():
+        # Plain tuples from one joined query; (date, id) are appended for the cursor.
+        # Fetch one extra row to know whether there is a next page.
+        rows = db.execute(
+            select(*[TRANSACTION_COLUMNS[name] for name in selected], Transaction.date, Transaction.id)
+            .outerjoin(Category, Category.id == Transaction.category_id)
+            .where(*filters)
+            .order_by(Transaction.date.desc(), Transaction.id.desc())
+            .limit(limit + 1)
+        ).all()
+        
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(rows[-1][-2], rows[-1][-1])
+        
+        # Rows already have the TransactionResponse shape: serialize them with
+        # orjson directly instead of validating a model per row
+        content = [dict(zip(selected, row)) for row in rows]
+        return ORJSONResponse(content=content).body, headers
+    
+    params = (month, year, type, category_id, date_from, date_to, limit, cursor, tuple(selected))
+    return cached_json_response(db, "transactions", params, if_none_match, build)
+
+
+@router.get("/transactions/export")
+def export_transactions(
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    month: int = None,
+    year: int = None,
+    type: str = None,
+    category_id: int = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_ledger_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Stream the ledger as CSV or NDJSON, oldest first, with the same filters as
+    the list endpoint. Rows are read in batches from a streaming cursor and
+    written out as they arrive, so memory use doesn't grow with the ledger.
+    """
+    _check_date_range(date_from, date_to)
+    stmt = (
+        select(
+            Transaction.id,
+            Transaction.date,
+            Transaction.description,
+            Transaction.amount,
+            Transaction.type,
+            Transaction.category_id,
+            Category.name.label("category_name"),
+            Transaction.month,
+            Transaction.year,
+            Transaction.notes,
+            Transaction.created_at,
+        )
+        .outerjoin(Category, Category.id == Transaction.category_id)
+        .where(*_transaction_filters(month, year, type, category_id, date_from, date_to))
+        .order_by(Transaction.date, Transaction.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    
+    def serialize(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for batch in db.execute(stmt).partitions():
+            writer.writerows([serialize(value) for value in row] for row in batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    
+    def generate_ndjson():
+        for batch in db.execute(stmt).partitions():
+            yield "".join(
+                json.dumps(
+                    {column: serialize(value) for column, value in zip(EXPORT_COLUMNS, row)},
+                    ensure_ascii=False
+                ) + "\n"
+                for row in batch
+            )
+    
+    if format == "ndjson":
+        content, media_type = generate_ndjson(), "application/x-ndjson"
+    else:
+        content, media_type = generate_csv(), "text/csv"
+    
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transacciones.{format}"'}
+    )
+
+
+@router.get("/transactions/search", response_model=List[TransactionResponse])
+def search_transactions(
+    q: str,
+    month: int = None,
+    year: int = None,
+    type: str = None,
+    category_id: int = None,
+    limit: int = Query(50, ge=1, le=MAX_SEARCH_RESULTS),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_ledger_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Search descriptions and notes, best matches first. Every word of `q` must
+    appear (as a word prefix) in the description or the notes.
+    """
+    terms = search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="La búsqueda debe incluir al menos una palabra")
+
+    filters = _transaction_filters(month, year, type, category_id)
+
+    def build():
+        if db.get_bind().dialect.name == "sqlite":
+            matches = ranked_matches(terms, filters)
+            stmt = (
+                select(*TRANSACTION_COLUMNS.values())
+                .select_from(matches)
+                .join(Transaction, Transaction.id == matches.c.id)
+                .outerjoin(Category, Category.id == Transaction.category_id)
+                .order_by(matches.c.rank, Transaction.date.desc(), Transaction.id.desc())
+            )
+        else:
+            stmt = (
+                select(*TRANSACTION_COLUMNS.values())
+                .outerjoin(Category, Category.id == Transaction.category_id)
+                .where(*like_filters(terms), *filters)
+                .order_by(Transaction.date.desc(), Transaction.id.desc())
+            )
+        rows = db.execute(stmt.limit(limit)).all()
+        content = [dict(zip(TRANSACTION_COLUMNS, row)) for row in rows]
+        return ORJSONResponse(content=content).body, {}
+
+    params = (tuple(terms), month, year, type, category_id, limit)
+    return cached_json_response(db, "transactions/search", params, if_none_match, build)
 
 
 @router.put("/transactions/{transaction_id}", response_model=TransactionResponse)
 def update_transaction(
     transaction_id: int,
     transaction: TransactionUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
     """Update a transaction"""
-    db_transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
-    if not db_transaction:
+    # A no-op UPDATE takes the write lock before the row is read, so the
+    # aggregate delta is computed from the values this write replaces even when
+    # another request updates or deletes the same transaction concurrently
+    locked = db.execute(
+        update(Transaction)
+        .where(Transaction.id == transaction_id)
+        .values(amount=Transaction.amount)
+        .execution_options(synchronize_session=False)
+    )
+    if locked.rowcount != 1:
         raise HTTPException(status_code=404, detail="Transacción no encontrada")
+    db_transaction = db.query(Transaction).filter(Transaction.id == transaction_id).one()
+    
+    previous_entry = ledger_entry(db_transaction)
     
     # Update fields
     if transaction.description is not None:
@@ -171,52 +492,50 @@ def update_transaction(
     if transaction.date is not None:
         # Parse date string to datetime
         try:
-            date_str = transaction.date.split('T')[0]  # Get just the date part
-            parsed_date = datetime.strptime(date_str, '%Y-%m-%d')
+            parsed_date = _parse_date(transaction.date)
             db_transaction.date = parsed_date
             db_transaction.month = parsed_date.month
             db_transaction.year = parsed_date.year
-        except (ValueError, AttributeError) as e:
-            print(f"Date parsing error in update: {e}")
+        except (ValueError, AttributeError):
             raise HTTPException(status_code=400, detail="Formato de fecha inválido. Use YYYY-MM-DD")
     if transaction.notes is not None:
         db_transaction.notes = transaction.notes
     
+    # Moves the amount across days/months/categories when date or category changed
+    update_ledger_totals(
+        db, removed=[previous_entry], added=[ledger_entry(db_transaction)]
+    )
+    bump_data_version(db)
     db.commit()
     db.refresh(db_transaction)
     
     # Get category
-    category = db.query(Category).filter(Category.id == db_transaction.category_id).first()
+    category = get_category(db, db_transaction.category_id)
     
-    return TransactionResponse(
-        id=db_transaction.id,
-        description=db_transaction.description,
-        amount=db_transaction.amount,
-        type=db_transaction.type,
-        category_id=db_transaction.category_id,
-        category_name=category.name if category else "Sin categoría",
-        category_color=category.color if category else "#gray",
-        category_icon=category.icon if category else "💰",
-        date=db_transaction.date,
-        month=db_transaction.month,
-        year=db_transaction.year,
-        notes=db_transaction.notes,
-        created_at=db_transaction.created_at
-    )
+    return _transaction_response(db_transaction, category)
 
 
 @router.delete("/transactions/{transaction_id}")
 def delete_transaction(
     transaction_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
     """Delete a transaction"""
-    db_transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
-    if not db_transaction:
+    # The values removed from the aggregates are the ones this statement
+    # deleted, read under its write lock; a concurrent delete of the same
+    # transaction matches no row and gets a 404
+    deleted = db.execute(
+        delete(Transaction)
+        .where(Transaction.id == transaction_id)
+        .returning(*LEDGER_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if len(deleted) != 1:
         raise HTTPException(status_code=404, detail="Transacción no encontrada")
     
-    db.delete(db_transaction)
+    update_ledger_totals(db, removed=[ledger_entry(deleted[0])])
+    bump_data_version(db)
     db.commit()
     
     return {"message": "Transacción eliminada exitosamente"}
@@ -227,213 +546,171 @@ def delete_transaction(
 def get_financial_summary(
     month: int = None,
     year: int = None,
-    db: Session = Depends(get_db),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
-    """Get financial summary with income/expense breakdown by category"""
-    query = db.query(Transaction)
-    
-    if month:
-        query = query.filter(Transaction.month == month)
-    if year:
-        query = query.filter(Transaction.year == year)
-    
-    transactions = query.all()
-    
-    # Calculate totals
-    total_income = sum(t.amount for t in transactions if t.type == "ingreso")
-    total_expenses = sum(t.amount for t in transactions if t.type == "gasto")
-    balance = total_income - total_expenses
-    
-    # Group by category for expenses
-    expense_by_cat = {}
-    for trans in transactions:
-        if trans.type == "gasto":
-            cat = db.query(Category).filter(Category.id == trans.category_id).first()
-            if cat:
-                if cat.name not in expense_by_cat:
-                    expense_by_cat[cat.name] = {
-                        "total": 0,
-                        "color": cat.color,
-                        "icon": cat.icon
-                    }
-                expense_by_cat[cat.name]["total"] += trans.amount
-    
-    # Group by category for income
-    income_by_cat = {}
-    for trans in transactions:
-        if trans.type == "ingreso":
-            cat = db.query(Category).filter(Category.id == trans.category_id).first()
-            if cat:
-                if cat.name not in income_by_cat:
-                    income_by_cat[cat.name] = {
-                        "total": 0,
-                        "color": cat.color,
-                        "icon": cat.icon
-                    }
-                income_by_cat[cat.name]["total"] += trans.amount
-    
-    # Build category summaries
-    expense_summaries = [
-        CategorySummary(
-            category_name=name,
-            category_color=data["color"],
-            category_icon=data["icon"],
-            total=data["total"],
-            percentage=(data["total"] / total_expenses * 100) if total_expenses > 0 else 0
-        )
-        for name, data in expense_by_cat.items()
-    ]
-    
-    income_summaries = [
-        CategorySummary(
-            category_name=name,
-            category_color=data["color"],
-            category_icon=data["icon"],
-            total=data["total"],
-            percentage=(data["total"] / total_income * 100) if total_income > 0 else 0
-        )
-        for name, data in income_by_cat.items()
-    ]
-    
-    return FinancialSummary(
-        total_income=total_income,
-        total_expenses=total_expenses,
-        balance=balance,
-        expense_by_category=expense_summaries,
-        income_by_category=income_summaries
-    )
+    """
+    Get financial summary with income/expense breakdown by category, for a
+    month/year or for a range of days with ?from=&to= (inclusive, either end optional)
+    """
+    by_range = date_from is not None or date_to is not None
+    if by_range and (month or year):
+        raise HTTPException(status_code=400, detail="Use month/year o from/to, no ambos")
+    _check_date_range(date_from, date_to)
+    
+    def build():
+        if by_range:
+            # Two running-total lookups per (type, category)
+            return build_financial_summary(range_category_totals(db, date_from, date_to)), {}
+        # One GROUP BY round trip; only the aggregated rows reach Python
+        rows = db.execute(category_totals_query(month=month, year=year)).all()
+        return build_financial_summary(rows), {}
+    
+    params = (month, year, date_from, date_to)
+    return cached_json_response(db, "summary", params, if_none_match, build)
 
 
 @router.get("/summary/monthly", response_model=List[MonthlySummary])
 def get_monthly_summaries(
-    year: int,
-    db: Session = Depends(get_db),
+    year: Optional[int] = None,
+    years: Optional[List[int]] = Query(None),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
-    """Get monthly summaries for a year"""
-    summaries = []
-    
-    for month in range(1, 13):
-        transactions = db.query(Transaction).filter(
-            Transaction.month == month,
-            Transaction.year == year
-        ).all()
-        
-        total_income = sum(t.amount for t in transactions if t.type == "ingreso")
-        total_expenses = sum(t.amount for t in transactions if t.type == "gasto")
-        
-        # Find top expense category
-        expense_by_cat = {}
-        for trans in transactions:
-            if trans.type == "gasto":
-                cat = db.query(Category).filter(Category.id == trans.category_id).first()
-                if cat:
-                    expense_by_cat[cat.name] = expense_by_cat.get(cat.name, 0) + trans.amount
-        
-        top_category = max(expense_by_cat.items(), key=lambda x: x[1])[0] if expense_by_cat else None
-        
-        summaries.append(MonthlySummary(
-            month=month,
-            year=year,
-            total_income=total_income,
-            total_expenses=total_expenses,
-            balance=total_income - total_expenses,
-            top_expense_category=top_category
-        ))
-    
-    return summaries
+    """
+    Get monthly summaries for a year, for several years with ?years=2025&years=2026,
+    or for every month touched by a range of days with ?from=&to= (the first and
+    last months only count the days inside the range; a missing end defaults to
+    the first/last day with transactions)
+    """
+    requested_years = sorted(set((years or []) + ([year] if year else [])))
+    by_range = date_from is not None or date_to is not None
+    if by_range and requested_years:
+        raise HTTPException(status_code=400, detail="Use year/years o from/to, no ambos")
+    if not by_range and not requested_years:
+        raise HTTPException(status_code=400, detail="Debe indicar year, years o from/to")
+    _check_date_range(date_from, date_to)
+    
+    def build():
+        if by_range:
+            first_day, last_day = daily_totals_bounds(db)
+            range_from, range_to = date_from or first_day, date_to or last_day
+            if range_from is None or range_to is None or range_from > range_to:
+                return [], {}
+            rows, months = range_monthly_totals(db, range_from, range_to)
+            return build_monthly_summaries(rows, months), {}
+        # One grouped query for every month of every requested year
+        rows = db.execute(monthly_category_totals_query(requested_years)).all()
+        months = [(y, m) for y in requested_years for m in range(1, 13)]
+        return build_monthly_summaries(rows, months), {}
+    
+    params = (tuple(requested_years), date_from, date_to)
+    return cached_json_response(db, "summary/monthly", params, if_none_match, build)
+
+
+# ============ ANALYTICS ============
+@router.get("/analytics/timeseries", response_model=TimeseriesResponse)
+def get_timeseries(
+    granularity: str = "monthly",
+    window: int = Query(3, ge=1, le=MAX_ROLLING_WINDOW),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_ledger_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Income, expenses, net and running balance per day, week or month, with the
+    rolling average of every category over the last `window` periods and the
+    change of each total against the previous period (month over month with
+    the default granularity). ?from=&to= widen to whole periods; a missing end
+    defaults to the first/last day with transactions, keeping at most the last
+    MAX_TIMESERIES_PERIODS periods when `from` is missing.
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail="granularity debe ser 'daily', 'weekly' o 'monthly'")
+    _check_date_range(date_from, date_to)
+
+    def build():
+        first_day, last_day = daily_totals_bounds(db)
+        range_from, range_to = date_from or first_day, date_to or last_day
+        if range_from is None or range_to is None or range_from > range_to:
+            return empty_timeseries(granularity, window), {}
+        if count_periods(range_from, range_to, granularity) > MAX_TIMESERIES_PERIODS:
+            if date_from is not None:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Máximo {MAX_TIMESERIES_PERIODS} períodos; use una granularidad mayor o un rango más corto"
+                )
+            # A default start is clamped instead, so that one mistyped old date
+            # doesn't make the request without parameters fail
+            range_from = last_periods_start(range_to, granularity, MAX_TIMESERIES_PERIODS)
+        # One query over the daily rollup, then NumPy passes over a compact matrix
+        content = build_timeseries(db, granularity, window, range_from, range_to)
+        return ORJSONResponse(content=content).body, {}
+
+    params = (granularity, window, date_from, date_to)
+    return cached_json_response(db, "analytics/timeseries", params, if_none_match, build)
 
 
 # ============ BUDGETS ============
 @router.post("/budgets", response_model=BudgetResponse)
 def create_budget(
     budget: BudgetCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
     """Create a budget for a category"""
-    # Check if budget already exists
-    existing = db.query(Budget).filter(
-        Budget.category_id == budget.category_id,
-        Budget.month == budget.month,
-        Budget.year == budget.year
-    ).first()
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Ya existe un presupuesto para esta categoría en este mes")
-    
+    # The unique index on (category_id, month, year) rejects duplicates
     db_budget = Budget(**budget.dict())
     db.add(db_budget)
-    db.commit()
-    db.refresh(db_budget)
+    bump_data_version(db)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Ya existe un presupuesto para esta categoría en este mes")
     
     # Get category and spent amount
-    category = db.query(Category).filter(Category.id == budget.category_id).first()
-    spent = db.query(func.sum(Transaction.amount)).filter(
-        Transaction.category_id == budget.category_id,
-        Transaction.month == budget.month,
-        Transaction.year == budget.year,
-        Transaction.type == "gasto"
-    ).scalar() or 0
-    
-    return BudgetResponse(
-        id=db_budget.id,
-        category_id=db_budget.category_id,
-        category_name=category.name if category else "Sin categoría",
-        amount=db_budget.amount,
-        month=db_budget.month,
-        year=db_budget.year,
-        spent=spent
-    )
+    row = db.execute(
+        budgets_with_spent_query(budget.month, budget.year).where(Budget.id == db_budget.id)
+    ).one()
+    return build_budget_response(row)
 
 
 @router.get("/budgets", response_model=List[BudgetResponse])
 def get_budgets(
     month: int,
     year: int,
-    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
     """Get budgets for a specific month"""
-    budgets = db.query(Budget).filter(
-        Budget.month == month,
-        Budget.year == year
-    ).all()
-    
-    result = []
-    for budget in budgets:
-        category = db.query(Category).filter(Category.id == budget.category_id).first()
-        spent = db.query(func.sum(Transaction.amount)).filter(
-            Transaction.category_id == budget.category_id,
-            Transaction.month == month,
-            Transaction.year == year,
-            Transaction.type == "gasto"
-        ).scalar() or 0
-        
-        result.append(BudgetResponse(
-            id=budget.id,
-            category_id=budget.category_id,
-            category_name=category.name if category else "Sin categoría",
-            amount=budget.amount,
-            month=budget.month,
-            year=budget.year,
-            spent=spent
-        ))
+    def build():
+        rows = db.execute(budgets_with_spent_query(month, year)).all()
+        return [build_budget_response(row) for row in rows], {}
     
-    return result
+    return cached_json_response(db, "budgets", (month, year), if_none_match, build)
 
 
 # ============ SAVINGS GOALS ============
 @router.post("/savings-goals", response_model=SavingsGoalResponse)
 def create_savings_goal(
     goal: SavingsGoalCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
     """Create a savings goal"""
     db_goal = SavingsGoal(**goal.dict())
     db.add(db_goal)
+    bump_data_version(db)
     db.commit()
     db.refresh(db_goal)
     
@@ -451,7 +728,7 @@ def create_savings_goal(
 
 @router.get("/savings-goals", response_model=List[SavingsGoalResponse])
 def get_savings_goals(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
     """Get all savings goals"""
@@ -476,7 +753,7 @@ def get_savings_goals(
 def update_savings_goal(
     goal_id: int,
     update: SavingsGoalUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_ledger_db),
     current_user = Depends(get_current_user)
 ):
     """Update savings goal progress"""
@@ -490,6 +767,7 @@ def update_savings_goal(
     if db_goal.current_amount >= db_goal.target_amount:
         db_goal.completed = True
     
+    bump_data_version(db)
     db.commit()
     db.refresh(db_goal)
     
@@ -2,14 +2,33 @@
 Import Excel summary data as transactions
 The Excel file contains monthly summaries with category totals, not individual transactions.
 We'll create one transaction per category per month.
+
+Each workbook is read in a single streaming pass (openpyxl read-only mode).
+Several workbooks can be imported at once from the command line; they are
+parsed in parallel and merged in one atomic transaction:
+
+    python backend/import_excel_data.py ~/finanzas/            # every .xlsx in a directory
+    python backend/import_excel_data.py 2024.xlsx 2025.xlsx --workers 4
+    python backend/import_excel_data.py workbook.xlsx --year 2026
 """
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import load_workbook
+from sqlalchemy import delete, exists, func, insert, literal, or_, select
+from sqlalchemy.orm import aliased
+import argparse
+import hashlib
+import math
+import re
 import sys
 import os
+import uuid
 from datetime import datetime
 
-sys.path.append(os.path.dirname(__file__))
-from database import SessionLocal, Transaction, Category, init_db
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.database import Transaction, Category, ImportStaging, ImportLog, init_db
+from backend.aggregations import rebuild_monthly_totals, rebuild_daily_totals
+from backend.response_cache import bump_data_version
+from backend.tenancy import ledger_session, PER_USER_LEDGERS
 
 # Month mapping
 MONTH_MAP = {
@@ -28,137 +47,315 @@ CATEGORY_MAPPING = {
     'Inversion': ('Inversiones', 'ingreso'),
 }
 
-def import_excel_summaries(excel_file, year=2026):
-    """Import monthly summary data from Excel"""
-    
-    # Initialize database
-    init_db()
-    db = SessionLocal()
-    
+# Summary layout of each month sheet: row 1 is a header, then column B holds
+# the category name and column C its amount
+CATEGORY_COLUMN = 1
+AMOUNT_COLUMN = 2
+
+YEAR_IN_FILENAME = re.compile(r"\b((?:19|20)\d{2})\b")
+
+
+def read_month_sheets(excel_file):
+    """
+    Read every month sheet in one pass over the workbook.
+    Returns {sheet_name: [(category_name, amount), ...]} with the non-zero
+    summary rows of each month sheet (empty list for a sheet without any).
+    """
+    sheets = {}
+    workbook = load_workbook(excel_file, read_only=True, data_only=True)
     try:
-        # Get all categories
-        categories = {cat.name: cat.id for cat in db.query(Category).all()}
-        print(f"Available categories: {list(categories.keys())}\n")
-        
-        # Load Excel file
-        xl = pd.ExcelFile(excel_file)
-        total_imported = 0
-        
-        # Process each sheet (month)
-        for sheet_name in xl.sheet_names:
-            if sheet_name not in MONTH_MAP:
-                print(f"Skipping sheet: {sheet_name}")
+        for sheet in workbook.worksheets:
+            if sheet.title not in MONTH_MAP:
                 continue
-            
-            month_num = MONTH_MAP[sheet_name]
-            print(f"\n{'='*60}")
-            print(f"Processing {sheet_name} (month {month_num})")
-            print(f"{'='*60}")
-            
-            # Read sheet
-            df = pd.read_excel(excel_file, sheet_name=sheet_name)
-            
-            # Look for category rows
-            # The structure is: column 1 has category names, column 2 has values
-            imported_count = 0
-            
-            for idx, row in df.iterrows():
+
+            rows = sheets[sheet.title] = []
+            for values in sheet.iter_rows(min_row=2, max_col=AMOUNT_COLUMN + 1, values_only=True):
+                if len(values) <= AMOUNT_COLUMN:
+                    continue
+
+                category_name = values[CATEGORY_COLUMN]
+                if category_name not in CATEGORY_MAPPING:
+                    continue
+
                 try:
-                    # Get category name from column 1 (Unnamed: 1)
-                    if 'Unnamed: 1' not in df.columns:
-                        continue
-                    
-                    category_name = row['Unnamed: 1']
-                    
-                    # Skip if not a valid category
-                    if pd.isna(category_name) or category_name not in CATEGORY_MAPPING:
-                        continue
-                    
-                    # Get amount from column 2 (index 0)
-                    amount_col = df.columns[2]  # Third column (index 0 or similar)
-                    amount = row[amount_col]
-                    
-                    # Skip if no amount or zero
-                    if pd.isna(amount) or amount == 0:
-                        continue
-                    
-                    try:
-                        amount = float(amount)
-                    except:
-                        continue
-                    
-                    if amount == 0:
-                        continue
-                    
+                    amount = float(values[AMOUNT_COLUMN])
+                except (TypeError, ValueError):
+                    continue
+
+                # Skip if no amount or zero
+                if math.isnan(amount) or amount == 0:
+                    continue
+
+                rows.append((category_name, amount))
+    finally:
+        workbook.close()
+
+    return sheets
+
+
+def parse_workbook(excel_file):
+    """Process pool worker: (excel_file, sheets) for one workbook"""
+    return excel_file, read_month_sheets(excel_file)
+
+
+def file_fingerprint(excel_file):
+    """SHA-256 of the workbook file"""
+    digest = hashlib.sha256()
+    with open(excel_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sheet_fingerprint(rows):
+    """SHA-256 of the rows a sheet contributes, so edits elsewhere in the sheet do not count as changes"""
+    return hashlib.sha256(repr(rows).encode()).hexdigest()
+
+
+def year_from_filename(excel_file):
+    """Fiscal year in a workbook name such as 'Finanzas Personales - 2026 (1).xlsx', or None"""
+    match = YEAR_IN_FILENAME.search(os.path.basename(excel_file))
+    return int(match.group(1)) if match else None
+
+
+def find_workbooks(paths):
+    """Expand directories into the .xlsx workbooks they contain"""
+    workbooks = []
+    for path in paths:
+        if os.path.isdir(path):
+            workbooks.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith(".xlsx") and not name.startswith("~$")  # skip Excel lock files
+            )
+        else:
+            workbooks.append(path)
+    return workbooks
+
+
+def import_workbooks(workbooks, workers=None, force=False, user_id=None):
+    """
+    Import several workbooks at once.
+
+    `workbooks` is a list of (excel_file, year). The files are parsed in a
+    process pool, their rows written to the import_staging table and merged
+    into transactions in a single database transaction: either every workbook
+    is imported or none is. A staged row is skipped when its (year, month,
+    description) is already in transactions or was staged from an earlier
+    file of the same run.
+
+    Re-imports are incremental: import_log keeps a fingerprint per (workbook,
+    sheet). A workbook whose file is unchanged is not even parsed, an
+    unchanged sheet is skipped, and a changed sheet replaces the rows it
+    imported before for that month. `force` re-evaluates every sheet.
+    `user_id` selects the ledger to import into when ledgers are per user.
+    Returns one report dict per workbook.
+    """
+    years = dict(workbooks)
+    files = list(years)
+    paths = {excel_file: os.path.abspath(excel_file) for excel_file in files}
+    file_hashes = {excel_file: file_fingerprint(excel_file) for excel_file in files}
+    report = {
+        excel_file: {"file": excel_file, "year": years[excel_file], "inserted": 0, "skipped": 0,
+                     "replaced": 0, "unchanged_sheets": 0}
+        for excel_file in files
+    }
+
+    init_db()
+    db = ledger_session(user_id)
+    batch_id = uuid.uuid4().hex
+
+    try:
+        logs = {
+            (entry.workbook, entry.sheet): entry
+            for entry in db.query(ImportLog).filter(ImportLog.workbook.in_(list(paths.values())))
+        }
+
+        # A byte-identical workbook imported for the same year needs no parsing
+        to_parse = []
+        for excel_file in files:
+            entries = [entry for (workbook, _), entry in logs.items() if workbook == paths[excel_file]]
+            if not force and entries and all(
+                entry.workbook_hash == file_hashes[excel_file] and entry.year == years[excel_file]
+                for entry in entries
+            ):
+                report[excel_file]["unchanged_sheets"] = len(entries)
+            else:
+                to_parse.append(excel_file)
+
+        # Parse the remaining workbooks, in parallel when there is more than one
+        if workers == 1 or len(to_parse) <= 1:
+            parsed = dict(map(parse_workbook, to_parse))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = dict(pool.map(parse_workbook, to_parse))
+
+        categories = {cat.name: cat.id for cat in db.query(Category).all()}
+
+        staged_rows = []
+        staged_per_file = {}
+        for excel_file in to_parse:
+            year = years[excel_file]
+            for sheet_name, rows in parsed[excel_file].items():
+                month_num = MONTH_MAP[sheet_name]
+                notes = f"Importado desde Excel - {sheet_name}"
+                content_hash = sheet_fingerprint(rows)
+                entry = logs.get((paths[excel_file], sheet_name))
+
+                if entry is None:
+                    entry = ImportLog(workbook=paths[excel_file], sheet=sheet_name)
+                    db.add(entry)
+                elif not force and entry.content_hash == content_hash and entry.year == year:
+                    report[excel_file]["unchanged_sheets"] += 1
+                    entry.workbook_hash = file_hashes[excel_file]
+                    continue
+                else:
+                    # Changed sheet: drop what it imported before for that month
+                    result = db.execute(
+                        delete(Transaction).where(
+                            Transaction.year == entry.year,
+                            Transaction.month == month_num,
+                            Transaction.notes == notes,
+                        )
+                    )
+                    report[excel_file]["replaced"] += result.rowcount
+
+                entry.year = year
+                entry.workbook_hash = file_hashes[excel_file]
+                entry.content_hash = content_hash
+                entry.imported_at = datetime.utcnow()
+
+                for category_name, amount in rows:
                     # Map to database category
                     db_category_name, trans_type = CATEGORY_MAPPING[category_name]
                     category_id = categories.get(db_category_name)
-                    
+
                     if not category_id:
                         print(f"⚠️  Category '{db_category_name}' not found in database")
+                        report[excel_file]["skipped"] += 1
                         continue
-                    
-                    # Create transaction date (first day of month)
-                    trans_date = datetime(year, month_num, 1)
-                    
-                    # Check if transaction already exists
-                    existing = db.query(Transaction).filter(
-                        Transaction.description == f"{category_name} - {sheet_name} {year}",
-                        Transaction.month == month_num,
-                        Transaction.year == year
-                    ).first()
-                    
-                    if existing:
-                        print(f"  ⏭️  Skipping {category_name}: already exists")
-                        continue
-                    
-                    # Create transaction
-                    transaction = Transaction(
-                        description=f"{category_name} - {sheet_name} {year}",
-                        amount=abs(amount),
-                        type=trans_type,
-                        category_id=category_id,
-                        date=trans_date,
-                        month=month_num,
-                        year=year,
-                        notes=f"Importado desde Excel - {sheet_name}"
-                    )
-                    
-                    db.add(transaction)
-                    imported_count += 1
-                    print(f"  ✅ {category_name}: ${amount:,.0f} ({trans_type})")
-                    
-                except Exception as e:
-                    print(f"  ⚠️  Error processing row {idx}: {e}")
-                    continue
-            
-            # Commit transactions for this month
-            if imported_count > 0:
-                db.commit()
-                print(f"\n✅ Imported {imported_count} transactions from {sheet_name}")
-                total_imported += imported_count
-            else:
-                print(f"\n⚠️  No transactions imported from {sheet_name}")
-        
-        print(f"\n{'='*60}")
-        print(f"IMPORT SUMMARY")
-        print(f"{'='*60}")
-        print(f"Total transactions imported: {total_imported}")
-        print(f"{'='*60}\n")
-        
-        # Show final database stats
-        total_trans = db.query(Transaction).count()
-        print(f"Total transactions in database: {total_trans}")
-        
+
+                    staged_rows.append({
+                        "batch_id": batch_id,
+                        "source_file": excel_file,
+                        "description": f"{category_name} - {sheet_name} {year}",
+                        "amount": abs(amount),
+                        "type": trans_type,
+                        "category_id": category_id,
+                        "date": datetime(year, month_num, 1),  # first day of month
+                        "month": month_num,
+                        "year": year,
+                        "notes": notes,
+                    })
+                    staged_per_file[excel_file] = staged_per_file.get(excel_file, 0) + 1
+
+        if staged_rows:
+            db.execute(insert(ImportStaging), staged_rows)
+
+            staged = ImportStaging.__table__
+            earlier = aliased(ImportStaging)
+            duplicate = or_(
+                # Already imported by a previous run
+                exists().where(
+                    Transaction.year == staged.c.year,
+                    Transaction.month == staged.c.month,
+                    Transaction.description == staged.c.description,
+                ),
+                # Staged by an earlier workbook of this run
+                exists().where(
+                    earlier.batch_id == batch_id,
+                    earlier.source_file != staged.c.source_file,
+                    earlier.id < staged.c.id,
+                    earlier.year == staged.c.year,
+                    earlier.month == staged.c.month,
+                    earlier.description == staged.c.description,
+                ),
+            )
+            in_batch = staged.c.batch_id == batch_id
+
+            skipped = dict(db.execute(
+                select(staged.c.source_file, func.count())
+                .where(in_batch, duplicate)
+                .group_by(staged.c.source_file)
+            ).all())
+            for excel_file, count in staged_per_file.items():
+                report[excel_file]["skipped"] += skipped.get(excel_file, 0)
+                report[excel_file]["inserted"] = count - skipped.get(excel_file, 0)
+
+            columns = ["description", "amount", "type", "category_id", "date", "month", "year", "notes"]
+            db.execute(
+                insert(Transaction).from_select(
+                    columns + ["created_at"],
+                    select(*[staged.c[name] for name in columns], literal(datetime.utcnow()))
+                    .where(in_batch, ~duplicate)
+                    .order_by(staged.c.id)
+                )
+            )
+            db.execute(delete(ImportStaging).where(ImportStaging.batch_id == batch_id))
+
+        # Keep the aggregate tables in sync, in the same commit as the log
+        if staged_rows or any(entry["replaced"] for entry in report.values()):
+            rebuild_monthly_totals(db)
+            rebuild_daily_totals(db)
+            bump_data_version(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    return [report[excel_file] for excel_file in files]
+
+
+def print_report(report):
+    """Per-workbook summary of an import"""
+    print(f"\n{'='*60}")
+    print(f"IMPORT SUMMARY")
+    print(f"{'='*60}")
+    for entry in report:
+        print(
+            f"{os.path.basename(entry['file'])} ({entry['year']}): "
+            f"{entry['inserted']} inserted, {entry['skipped']} skipped, "
+            f"{entry['replaced']} replaced, {entry['unchanged_sheets']} unchanged sheets"
+        )
+    print(f"Total transactions imported: {sum(entry['inserted'] for entry in report)}")
+    print(f"{'='*60}\n")
+
+
+def import_excel_summaries(excel_file, year=2026):
+    """Import monthly summary data from Excel"""
+    try:
+        report = import_workbooks([(excel_file, year)])
+        print_report(report)
     except Exception as e:
         print(f"\n❌ Error during import: {e}")
         import traceback
         traceback.print_exc()
-        db.rollback()
-    finally:
-        db.close()
 
 
 if __name__ == "__main__":
-    excel_file = "../Finanzas Personales - 2026 (1).xlsx"
-    import_excel_summaries(excel_file, year=2026)
+    parser = argparse.ArgumentParser(description="Import Excel summary workbooks as transactions")
+    parser.add_argument(
+        "paths", nargs="*", default=["../Finanzas Personales - 2026 (1).xlsx"],
+        help="Workbooks, or directories containing them"
+    )
+    parser.add_argument("--year", type=int, help="Year of every workbook (default: taken from each file name)")
+    parser.add_argument("--workers", type=int, help="Parser processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="Re-import every sheet, even if unchanged")
+    parser.add_argument("--user-id", type=int, help="Ledger to import into (required with FINANZAS_TENANCY=per_user)")
+    args = parser.parse_args()
+    if PER_USER_LEDGERS and args.user_id is None:
+        parser.error("--user-id is required with FINANZAS_TENANCY=per_user")
+
+    workbooks = []
+    for excel_file in find_workbooks(args.paths):
+        if not os.path.isfile(excel_file):
+            parser.error(f"Workbook not found: {excel_file}")
+        year = args.year or year_from_filename(excel_file)
+        if year is None:
+            parser.error(f"No year in file name, use --year: {excel_file}")
+        workbooks.append((excel_file, year))
+    if not workbooks:
+        parser.error("No workbooks found")
+
+    print_report(import_workbooks(workbooks, workers=args.workers, force=args.force, user_id=args.user_id))
@@ -1,15 +1,23 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import hashlib
+import math
+import os
+import numpy as np
 
 from .models import (
-    TaxRequest, TaxResponse, ParafiscalesDetail,
+    TaxRequest, TaxResponse, TaxCurveResponse,
     LoginRequest, LoginResponse
 )
-from .database import get_db, init_db
+from .database import get_db, init_db, USE_ASYNC_DB, async_engine
 from .auth import verify_access_code, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from .financial_routes import router as financial_router
+from .response_cache import etag_matches
+from .tenancy import tenant_engines
+from . import tax_engine
 
 # Initialize FastAPI app
 app = FastAPI(title="Gestión Financiera Personal", version="2.0.0")
@@ -21,6 +29,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Initialize database on startup
@@ -28,7 +37,20 @@ app.add_middleware(
 def startup_event():
     init_db()
 
-# Include financial routes
+
+# Close pooled aiosqlite connections so their worker threads let the process exit,
+# and the engines of per-user ledgers
+@app.on_event("shutdown")
+async def shutdown_event():
+    if async_engine is not None:
+        await async_engine.dispose()
+    tenant_engines.dispose_all()
+
+# Include financial routes (async variants when FINANZAS_ASYNC_DB=1)
+if USE_ASYNC_DB:
+    from .async_financial_routes import router as financial_router
+else:
+    from .financial_routes import router as financial_router
 app.include_router(financial_router)
 
 # ============ AUTHENTICATION ============
@@ -46,7 +68,7 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data={"sub": str(user.id), "name": user.name},
         expires_delta=access_token_expires
     )
     
@@ -58,70 +80,6 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
 
 # ============ TAX CALCULATOR (EXISTING FUNCTIONALITY) ============
 
-# 2025 Colombian Tax Rates
-INCOME_TAX_BRACKETS_2025 = [
-    (0, 1400 * 95000, 0.00),           # 0% hasta ~133M COP
-    (1400 * 95000, 3500 * 95000, 0.19), # 19% hasta ~332M COP
-    (3500 * 95000, 9200 * 95000, 0.28), # 28% hasta ~874M COP
-    (9200 * 95000, float('inf'), 0.33), # 33% en adelante
-]
-
-SAS_TAX_RATE_2025 = 0.35  # 35% flat rate for SAS
-PARAFISCALES_RATES = {
-    "salud": 0.125,      # 12.5% (8.5% empleador + 4% empleado)
-    "pension": 0.16,     # 16% (12% empleador + 4% empleado)
-    "arl": 0.00522       # 0.522% (riesgo I - mínimo)
-}
-
-# UVT 2025 (Unidad de Valor Tributario)
-UVT_2025 = 47065  # COP
-
-def calculate_income_tax_natural(annual_income: float, deductions: float) -> float:
-    """Calculate progressive income tax for natural persons (2025 rates)"""
-    taxable_income = max(0, annual_income - deductions)
-    tax = 0.0
-    
-    for i, (lower, upper, rate) in enumerate(INCOME_TAX_BRACKETS_2025):
-        if taxable_income <= lower:
-            break
-        
-        bracket_income = min(taxable_income, upper) - lower
-        tax += bracket_income * rate
-        
-        if taxable_income <= upper:
-            break
-    
-    return tax
-
-def calculate_income_tax_sas(annual_income: float) -> float:
-    """Calculate flat income tax for SAS (2025 rate)"""
-    return annual_income * SAS_TAX_RATE_2025
-
-def calculate_parafiscales(monthly_income: float) -> ParafiscalesDetail:
-    """Calculate parafiscales (health, pension, ARL) - monthly basis"""
-    salud = monthly_income * PARAFISCALES_RATES["salud"]
-    pension = monthly_income * PARAFISCALES_RATES["pension"]
-    arl = monthly_income * PARAFISCALES_RATES["arl"]
-    
-    return ParafiscalesDetail(
-        salud=round(salud, 2),
-        pension=round(pension, 2),
-        arl=round(arl, 2),
-        total=round(salud + pension + arl, 2)
-    )
-
-def calculate_deductions(afc: float, mortgage_interest: float) -> float:
-    """Calculate total deductions (AFC + mortgage interest)"""
-    # AFC: Max 30% of annual income, up to 3,800 UVT
-    max_afc = 3800 * UVT_2025
-    afc_deduction = min(afc, max_afc)
-    
-    # Mortgage interest: Max 1,200 UVT
-    max_mortgage = 1200 * UVT_2025
-    mortgage_deduction = min(mortgage_interest, max_mortgage)
-    
-    return afc_deduction + mortgage_deduction
-
 @app.get("/")
 async def root():
     return {
@@ -129,11 +87,90 @@ async def root():
         "version": "2.0.0",
         "endpoints": {
             "auth": "/api/auth/login (POST)",
-            "calculate_taxes": "/api/calculate (POST)",
+            "calculate_taxes": "/api/calculate (POST, GET)",
+            "calculate_taxes_batch": "/api/calculate/batch (POST)",
+            "tax_curve": "/api/calculate/curve (GET)",
+            "tax_cache_stats": "/api/calculate/cache (GET)",
             "financial": "/api/financial/* (requires authentication)"
         }
     }
 
+# Upper bound on monetary inputs of the calculators (COP). Far above any real
+# income, and low enough that every derived amount stays finite in JSON.
+MAX_TAX_AMOUNT = 1e15
+
+def _valid_amount(value: float) -> bool:
+    """Whether a monetary input is finite and within 0..MAX_TAX_AMOUNT"""
+    return math.isfinite(value) and 0 <= value <= MAX_TAX_AMOUNT
+
+
+# Result cache of /api/calculate. The calculation is a pure function of the
+# normalized request, so identical submissions are served from memory and
+# carry an ETag/Cache-Control that lets browsers and proxies reuse them.
+TAX_CACHE_SIZE = int(os.getenv("FINANZAS_TAX_CACHE_SIZE", "4096"))
+TAX_CACHE_MAX_AGE = int(os.getenv("FINANZAS_TAX_CACHE_MAX_AGE", "3600"))  # seconds
+
+@lru_cache(maxsize=TAX_CACHE_SIZE)
+def _cached_tax_result(
+    legal_status: str,
+    year: int,
+    ruleset_version: str,
+    monthly_income: float,
+    afc_contributions: float,
+    mortgage_interest: float
+) -> Tuple[bytes, str]:
+    """Serialized TaxResponse and its ETag for one normalized request"""
+    result = tax_engine.calculate_taxes(
+        tax_engine.TAX_RULES[year], legal_status, monthly_income, afc_contributions, mortgage_interest
+    )
+    body = TaxResponse(**result).json().encode()
+    etag = f'"{ruleset_version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+    return body, etag
+
+def _invalid_tax_amounts(request: TaxRequest) -> List[str]:
+    """Monetary fields of a request that are NaN, infinite, negative or too large"""
+    amounts = {
+        "monthly_income": request.monthly_income,
+        "monthly_expenses": request.monthly_expenses,
+        "afc_contributions": request.afc_contributions,
+        "mortgage_interest": request.mortgage_interest,
+        "patrimony": request.patrimony,
+    }
+    return [name for name, value in amounts.items() if not _valid_amount(value)]
+
+def _amounts_error(invalid: List[str], prefix: str = "") -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"{prefix}Monto inválido en {', '.join(invalid)}: se requiere 0 <= monto <= {MAX_TAX_AMOUNT:.0e}"
+    )
+
+def _tax_result_response(request: TaxRequest, if_none_match: Optional[str] = None) -> Response:
+    """
+    Cached /api/calculate response. Only the fields that affect the result
+    form the key: monetary inputs rounded to cents, legal status, year and
+    rule-set version (monthly_expenses and patrimony are informational).
+    """
+    if request.year not in tax_engine.TAX_RULES:
+        raise HTTPException(status_code=400, detail=f"Año fiscal no soportado: {request.year}")
+    # Before the cache lookup: NaN/Infinity can't be serialized as JSON, and a
+    # NaN key never hits, so each one would evict a real entry
+    invalid = _invalid_tax_amounts(request)
+    if invalid:
+        raise _amounts_error(invalid)
+    
+    body, etag = _cached_tax_result(
+        "natural" if request.legal_status == "natural" else "sas",
+        request.year,
+        tax_engine.RULESET_VERSION,
+        round(request.monthly_income, 2),
+        round(request.afc_contributions, 2),
+        round(request.mortgage_interest, 2)
+    )
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={TAX_CACHE_MAX_AGE}"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.post("/api/calculate", response_model=TaxResponse)
 async def calculate_taxes(request: TaxRequest):
     """
@@ -145,50 +182,202 @@ async def calculate_taxes(request: TaxRequest):
     - **afc_contributions**: Annual AFC contributions in COP
     - **mortgage_interest**: Annual mortgage interest paid in COP
     - **patrimony**: Total patrimony in COP (informational)
+    - **year**: Fiscal year whose rules apply (default 2025)
+    
+    Monetary inputs are rounded to cents. Results are memoized per request.
+    """
+    return _tax_result_response(request)
+
+@app.get("/api/calculate", response_model=TaxResponse)
+async def calculate_taxes_get(
+    monthly_income: float,
+    legal_status: str = "natural",
+    monthly_expenses: float = 0,
+    afc_contributions: float = 0,
+    mortgage_interest: float = 0,
+    patrimony: float = 0,
+    year: int = tax_engine.DEFAULT_TAX_YEAR,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Same as POST /api/calculate with the fields as query parameters, so the
+    response can be cached by browsers and proxies and revalidated with
+    If-None-Match (304 Not Modified)
+    """
+    request = TaxRequest(
+        legal_status=legal_status,
+        monthly_income=monthly_income,
+        monthly_expenses=monthly_expenses,
+        afc_contributions=afc_contributions,
+        mortgage_interest=mortgage_interest,
+        patrimony=patrimony,
+        year=year
+    )
+    return _tax_result_response(request, if_none_match)
+
+@app.get("/api/calculate/cache")
+async def get_tax_cache_stats():
+    """Hit/miss counters of the /api/calculate and /api/calculate/curve caches"""
+    stats = {}
+    for name, cached in (("calculate", _cached_tax_result), ("curve", _tax_curve)):
+        info = cached.cache_info()
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+        }
+    stats["ruleset_version"] = tax_engine.RULESET_VERSION
+    return stats
+
+
+# Upper bound on scenarios accepted by /api/calculate/batch
+MAX_TAX_BATCH = 10000
+
+@app.post("/api/calculate/batch", response_model=List[TaxResponse])
+def calculate_taxes_batch(requests: List[TaxRequest]):
     """
+    Calculate taxes for many scenarios at once (e.g. a whole payroll roster).
     
-    # Calculate annual income
-    annual_income = request.monthly_income * 12
+    Accepts a JSON array of the same objects as /api/calculate and returns the
+    results in the same order, computed with array operations over the bracket table
+    of each scenario's fiscal year.
+    """
+    if len(requests) > MAX_TAX_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Máximo {MAX_TAX_BATCH} escenarios por solicitud"
+        )
+    if not requests:
+        return []
+    for i, request in enumerate(requests):
+        invalid = _invalid_tax_amounts(request)
+        if invalid:
+            raise _amounts_error(invalid, prefix=f"Escenario {i}: ")
     
-    # Calculate deductions
-    deductions = calculate_deductions(
-        request.afc_contributions,
-        request.mortgage_interest
-    )
+    years = sorted({r.year for r in requests})
+    unsupported = [year for year in years if year not in tax_engine.TAX_RULES]
+    if unsupported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Año fiscal no soportado: {unsupported[0]}"
+        )
     
-    # Calculate income tax based on legal status
-    if request.legal_status == "natural":
-        income_tax = calculate_income_tax_natural(annual_income, deductions)
-    else:  # SAS
-        income_tax = calculate_income_tax_sas(annual_income)
+    # One array pass per fiscal year present in the batch
+    responses = [None] * len(requests)
+    for year in years:
+        indices = [i for i, r in enumerate(requests) if r.year == year]
+        group = [requests[i] for i in indices]
+        results = tax_engine.calculate_taxes_array(
+            tax_engine.TAX_RULES[year],
+            natural=np.array([r.legal_status == "natural" for r in group]),
+            monthly_income=np.array([r.monthly_income for r in group], dtype=float),
+            afc_contributions=np.array([r.afc_contributions for r in group], dtype=float),
+            mortgage_interest=np.array([r.mortgage_interest for r in group], dtype=float)
+        )
+        columns = {name: values.tolist() for name, values in results.items()}
+        
+        # Plain dicts: response_model validates them once into TaxResponse
+        for j, i in enumerate(indices):
+            responses[i] = {
+                "annual_income": columns["annual_income"][j],
+                "taxable_income": columns["taxable_income"][j],
+                "income_tax": columns["income_tax"][j],
+                "parafiscales": {
+                    "salud": columns["salud"][j],
+                    "pension": columns["pension"][j],
+                    "arl": columns["arl"][j],
+                    "total": columns["parafiscales_total"][j],
+                },
+                "total_tax_burden": columns["total_tax_burden"][j],
+                "net_annual_income": columns["net_annual_income"][j],
+                "effective_tax_rate": columns["effective_tax_rate"][j],
+                "deductions_applied": columns["deductions_applied"][j],
+            }
     
-    # Calculate parafiscales (monthly, then annualize)
-    parafiscales_monthly = calculate_parafiscales(request.monthly_income)
-    parafiscales_annual = ParafiscalesDetail(
-        salud=parafiscales_monthly.salud * 12,
-        pension=parafiscales_monthly.pension * 12,
-        arl=parafiscales_monthly.arl * 12,
-        total=parafiscales_monthly.total * 12
+    return responses
+
+
+# Upper bound on income points returned by /api/calculate/curve
+MAX_CURVE_POINTS = 2000
+
+@lru_cache(maxsize=256)
+def _tax_curve(
+    legal_status: str,
+    year: int,
+    afc_contributions: float,
+    mortgage_interest: float,
+    income_min: float,
+    step: float,
+    points: int
+) -> bytes:
+    """
+    Serialized TaxCurveResponse for one parameter set. Cached as the JSON body
+    since charts re-request the same sweeps, so a hit skips both the array pass
+    and re-validating thousands of floats.
+    """
+    monthly_income = income_min + step * np.arange(points, dtype=float)
+    results = tax_engine.calculate_taxes_array(
+        tax_engine.TAX_RULES[year],
+        natural=np.full(points, legal_status == "natural"),
+        monthly_income=monthly_income,
+        afc_contributions=np.full(points, afc_contributions, dtype=float),
+        mortgage_interest=np.full(points, mortgage_interest, dtype=float)
     )
+    return TaxCurveResponse(
+        legal_status=legal_status,
+        year=year,
+        monthly_income=monthly_income.tolist(),
+        annual_income=results["annual_income"].tolist(),
+        income_tax=results["income_tax"].tolist(),
+        parafiscales=results["parafiscales_total"].tolist(),
+        total_tax_burden=results["total_tax_burden"].tolist(),
+        net_annual_income=results["net_annual_income"].tolist(),
+        effective_tax_rate=results["effective_tax_rate"].tolist()
+    ).json().encode()
+
+@app.get("/api/calculate/curve", response_model=TaxCurveResponse)
+def calculate_tax_curve(
+    income_min: float,
+    income_max: float,
+    step: float,
+    legal_status: str = "natural",
+    afc_contributions: float = 0,
+    mortgage_interest: float = 0,
+    year: int = tax_engine.DEFAULT_TAX_YEAR
+):
+    """
+    Evaluate taxes across a range of monthly incomes, for charts and what-if analysis
     
-    # Calculate totals
-    total_tax_burden = income_tax + parafiscales_annual.total
-    taxable_income = annual_income - deductions if request.legal_status == "natural" else annual_income
-    net_annual_income = annual_income - total_tax_burden
-    effective_tax_rate = (total_tax_burden / annual_income * 100) if annual_income > 0 else 0
+    - **income_min** / **income_max**: Monthly income range in COP (inclusive)
+    - **step**: Monthly income increment between points
+    - **legal_status**, **afc_contributions**, **mortgage_interest**, **year**: as in /api/calculate
+    
+    Returns one column per result, each with one value per income point.
+    """
+    if legal_status not in ("natural", "sas"):
+        raise HTTPException(status_code=400, detail="legal_status debe ser 'natural' o 'sas'")
+    if year not in tax_engine.TAX_RULES:
+        raise HTTPException(status_code=400, detail=f"Año fiscal no soportado: {year}")
+    amounts = (income_min, income_max, afc_contributions, mortgage_interest)
+    valid = all(_valid_amount(value) for value in amounts) and math.isfinite(step)
+    if not valid or step <= 0 or income_max < income_min:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                "Rango inválido: se requiere 0 <= income_min <= income_max, step > 0 y "
+                f"afc_contributions, mortgage_interest >= 0 (montos hasta {MAX_TAX_AMOUNT:.0e})"
+            )
+        )
+    
+    points = math.floor((income_max - income_min) / step) + 1
+    if points > MAX_CURVE_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {MAX_CURVE_POINTS} puntos por curva; aumente step o reduzca el rango"
+        )
     
-    return TaxResponse(
-        annual_income=round(annual_income, 2),
-        taxable_income=round(taxable_income, 2),
-        income_tax=round(income_tax, 2),
-        parafiscales=ParafiscalesDetail(
-            salud=round(parafiscales_annual.salud, 2),
-            pension=round(parafiscales_annual.pension, 2),
-            arl=round(parafiscales_annual.arl, 2),
-            total=round(parafiscales_annual.total, 2)
-        ),
-        total_tax_burden=round(total_tax_burden, 2),
-        net_annual_income=round(net_annual_income, 2),
-        effective_tax_rate=round(effective_tax_rate, 2),
-        deductions_applied=round(deductions, 2)
+    body = _tax_curve(
+        legal_status, year, afc_contributions, mortgage_interest, income_min, step, points
     )
+    return Response(content=body, media_type="application/json")
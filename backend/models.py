@@ -11,6 +11,7 @@ class TaxRequest(BaseModel):
     afc_contributions: float
     mortgage_interest: float
     patrimony: float
+    year: int = 2025  # fiscal year whose tax rules apply
 
 
 class ParafiscalesDetail(BaseModel):
@@ -31,6 +32,18 @@ class TaxResponse(BaseModel):
     deductions_applied: float
 
 
+class TaxCurveResponse(BaseModel):
+    legal_status: str
+    year: int
+    monthly_income: List[float]
+    annual_income: List[float]
+    income_tax: List[float]
+    parafiscales: List[float]  # annual total
+    total_tax_burden: List[float]
+    net_annual_income: List[float]
+    effective_tax_rate: List[float]
+
+
 # New authentication models
 class LoginRequest(BaseModel):
     access_code: str
@@ -80,6 +93,19 @@ class TransactionResponse(BaseModel):
         orm_mode = True
 
 
+class BulkItemResult(BaseModel):
+    index: int  # Position of the item in the request
+    status: str  # "created" or "error"
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class TransactionBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+
 # Category models
 class CategoryResponse(BaseModel):
     id: int
@@ -163,3 +189,26 @@ class FinancialSummary(BaseModel):
     expense_by_category: List[CategorySummary]
     income_by_category: List[CategorySummary]
 
+
+
+# Analytics models: one value per period in every list
+class CategoryTimeseries(BaseModel):
+    category_id: int
+    category_name: str
+    type: str
+    totals: List[float]
+    rolling_average: List[float]  # over the last `window` periods
+
+
+class TimeseriesResponse(BaseModel):
+    granularity: str  # daily, weekly or monthly
+    window: int
+    periods: List[str]  # first day of each period
+    income: List[float]
+    expenses: List[float]
+    net: List[float]
+    running_balance: List[float]  # ledger balance at the end of the period
+    income_change: List[float]  # against the previous period
+    expenses_change: List[float]
+    net_change: List[float]
+    categories: List[CategoryTimeseries]
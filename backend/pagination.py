@@ -0,0 +1,26 @@
+"""
+Opaque keyset cursors for paginated transaction lists.
+
+Transactions are listed newest first, ordered by (date, id). A cursor encodes
+the (date, id) of the last row of a page, and the next page continues strictly
+after it, so every page costs the same index seek no matter how deep it is.
+"""
+import base64
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(date: datetime, transaction_id: int) -> str:
+    """Encode the position of a row as a URL-safe opaque string"""
+    raw = f"{date.isoformat()}|{transaction_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_str, id_str = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(date_str), int(id_str)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
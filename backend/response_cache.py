@@ -0,0 +1,116 @@
+"""
+Conditional GETs and an in-process response cache for the read endpoints.
+
+Every write bumps the counter in the `data_version` table, in the same database
+transaction as the write itself. Read endpoints key their serialized responses
+on (ledger, endpoint, params, data version) and derive the ETag from that key,
+where the ledger is the shared database or one user's own file (tenancy.py), so:
+
+- a client that sends the current ETag in If-None-Match gets 304 Not Modified;
+- any other request for the same data is served from memory;
+- the first request after a write misses (new version) and recomputes.
+
+Old versions are never looked up again and age out of the LRU.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import hashlib
+import os
+import threading
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from .database import DataVersion, session_tenant
+
+RESPONSE_CACHE_SIZE = int(os.getenv("FINANZAS_RESPONSE_CACHE_SIZE", "512"))
+
+
+class ResponseCache:
+    """Bounded LRU of cache key -> (JSON body, extra headers)"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, entry: Tuple[bytes, Dict[str, str]]):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE)
+
+
+def get_data_version(db: Session) -> int:
+    """Current data version"""
+    return db.scalar(select(DataVersion.version).where(DataVersion.id == 1)) or 0
+
+
+def bump_data_version(db: Session):
+    """Increment the data version; call in the same transaction as the write"""
+    db.execute(
+        update(DataVersion).where(DataVersion.id == 1).values(version=DataVersion.version + 1)
+    )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches an ETag"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def cached_json_response(
+    db: Session,
+    endpoint: str,
+    params: Tuple,
+    if_none_match: Optional[str],
+    build: Callable[[], Tuple[Any, Dict[str, str]]]
+) -> Response:
+    """
+    Serve a read endpoint through the response cache.
+
+    `params` must be hashable and identify the response together with
+    `endpoint`. `build` returns the response content (anything FastAPI can
+    encode, or an already serialized JSON body as bytes) and extra headers to
+    send with it; it only runs on a cache miss.
+    """
+    key = (session_tenant(db), endpoint, params, get_data_version(db))
+    etag = '"' + hashlib.sha1(repr(key).encode()).hexdigest()[:20] + '"'
+    # Cacheable, but revalidated (cheaply, via ETag) before every use
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    entry = response_cache.get(key)
+    if entry is None:
+        content, extra_headers = build()
+        if not isinstance(content, bytes):
+            content = JSONResponse(content=jsonable_encoder(content)).body
+        entry = (content, extra_headers)
+        response_cache.put(key, entry)
+
+    body, extra_headers = entry
+    return Response(content=body, media_type="application/json", headers={**headers, **extra_headers})
@@ -0,0 +1,149 @@
+"""
+Full-text search over transaction descriptions and notes.
+
+On SQLite the ledger is mirrored into `transactions_fts`, an FTS5 table with
+external content (it indexes `transactions` without storing a second copy of
+the text). Triggers on `transactions` keep the index in sync with every write
+at the SQL level, so the API routes, bulk inserts and the Excel importer's
+INSERT ... SELECT need no extra code. Terms are matched as prefixes, without
+case or accents ("alimenta" finds "Alimentación"), and results are ranked with
+bm25, weighting the description above the notes.
+
+bm25 is only computed for the newest SEARCH_RANK_WINDOW matches (by id). That
+keeps a search for a word found in half the ledger as cheap as a rare one; for
+such words the best matches among the most recent ones are returned.
+
+Other databases fall back to a case-insensitive LIKE per term, newest first.
+
+Rebuild the index from the ledger (e.g. after restoring a backup) with:
+
+    python -m backend.search rebuild
+    python -m backend.search rebuild --user-id 2   # FINANZAS_TENANCY=per_user
+"""
+import os
+import re
+from typing import List
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, literal_column, or_, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from .database import Transaction
+
+FTS_TABLE = "transactions_fts"
+
+# Matches ranked per search, newest first (see the module docstring)
+SEARCH_RANK_WINDOW = int(os.getenv("FINANZAS_SEARCH_RANK_WINDOW", "2000"))
+
+# Column mirror of the FTS table, for building queries. It has its own
+# metadata so that create_all never tries to create it as a regular table.
+transactions_fts = Table(
+    FTS_TABLE, MetaData(),
+    Column("rowid", Integer),
+    Column("description", String),
+    Column("notes", String),
+)
+
+# bm25 weights of the description and notes columns (lower rank is better)
+FTS_RANK = literal_column(f"bm25({FTS_TABLE}, 2.0, 1.0)")
+
+FTS_SCHEMA = [
+    # Prefix indexes on 2-4 characters keep short prefix queries cheap
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        description, notes,
+        content='transactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, description, notes) VALUES (new.id, new.description, new.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, notes)
+        VALUES ('delete', old.id, old.description, old.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS transactions_fts_update
+    AFTER UPDATE OF description, notes ON transactions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, notes)
+        VALUES ('delete', old.id, old.description, old.notes);
+        INSERT INTO {FTS_TABLE}(rowid, description, notes) VALUES (new.id, new.description, new.notes);
+    END""",
+]
+
+SEARCH_TERM = re.compile(r"\w+")
+
+
+def search_terms(query: str) -> List[str]:
+    """Words of a search query; punctuation and FTS5 operators are dropped"""
+    return SEARCH_TERM.findall(query)
+
+
+def fts_match_expression(terms: List[str]) -> str:
+    """FTS5 MATCH expression requiring every term, each as a prefix"""
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def like_filters(terms: List[str]):
+    """Fallback WHERE clauses for databases without FTS5: every term in description or notes"""
+    return [
+        or_(Transaction.description.ilike(f"%{term}%"), Transaction.notes.ilike(f"%{term}%"))
+        for term in terms
+    ]
+
+
+def ranked_matches(terms: List[str], filters):
+    """
+    Subquery of (id, rank) for the newest SEARCH_RANK_WINDOW transactions
+    matching the terms and the filters; order by `rank` for best matches first.
+    """
+    match = text(f"{FTS_TABLE} MATCH :fts_query").bindparams(fts_query=fts_match_expression(terms))
+    return (
+        select(transactions_fts.c.rowid.label("id"), FTS_RANK.label("rank"))
+        .join(Transaction, Transaction.id == transactions_fts.c.rowid)
+        .where(match, *filters)
+        .order_by(transactions_fts.c.rowid.desc())
+        .limit(SEARCH_RANK_WINDOW)
+        .subquery()
+    )
+
+
+def rebuild_search_index(connection: Connection):
+    """Re-index every transaction"""
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def ensure_search_index(bind: Engine):
+    """Create the FTS table and its triggers if missing, indexing the existing ledger"""
+    with bind.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE}
+        ).first()
+        for statement in FTS_SCHEMA:
+            connection.execute(text(statement))
+        if not exists:
+            rebuild_search_index(connection)
+
+
+if __name__ == "__main__":
+    import argparse
+    from .database import init_db, IS_SQLITE
+    from .tenancy import ledger_session, PER_USER_LEDGERS
+
+    parser = argparse.ArgumentParser(description="Rebuild the full-text search index (SQLite only)")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user-id", type=int, help="Ledger to re-index (required with FINANZAS_TENANCY=per_user)")
+    args = parser.parse_args()
+    if not IS_SQLITE:
+        parser.error("the search index only exists on SQLite")
+    if PER_USER_LEDGERS and args.user_id is None:
+        parser.error("--user-id is required with FINANZAS_TENANCY=per_user")
+
+    init_db()
+    db = ledger_session(args.user_id)
+    try:
+        connection = db.connection()
+        rebuild_search_index(connection)
+        rows = connection.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+        db.commit()
+    finally:
+        db.close()
+    print(f"✅ {FTS_TABLE} reconstruida: {rows} filas")
@@ -0,0 +1,231 @@
+"""
+Colombian tax rules and calculations, shared by the API (`backend/main.py`)
+and the standalone calculator (`main.py` at the repository root).
+
+Rules are registered per fiscal year. Each rule set precomputes the tax owed
+at the start of every income bracket, so the progressive income tax is one
+binary search plus one multiplication instead of a walk over the brackets.
+Results are returned as plain dicts with the shape of `TaxResponse`.
+"""
+from bisect import bisect_right
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class TaxRules:
+    """Tax parameters of one fiscal year"""
+
+    def __init__(
+        self,
+        year: int,
+        uvt: float,
+        income_tax_brackets: List[Tuple[float, float, float]],
+        sas_tax_rate: float,
+        parafiscales_rates: Dict[str, float],
+        afc_cap_uvt: float = 3800,
+        mortgage_cap_uvt: float = 1200,
+    ):
+        self.year = year
+        self.uvt = uvt
+        self.income_tax_brackets = income_tax_brackets
+        self.sas_tax_rate = sas_tax_rate
+        self.parafiscales_rates = parafiscales_rates
+        self.max_afc = afc_cap_uvt * uvt
+        self.max_mortgage = mortgage_cap_uvt * uvt
+
+        # Tax owed at the lower bound of each bracket, accumulated bracket by
+        # bracket in the same order as a linear walk would add them
+        self.bracket_lowers = [lower for lower, _, _ in income_tax_brackets]
+        self.bracket_rates = [rate for _, _, rate in income_tax_brackets]
+        self.bracket_base_tax = []
+        base_tax = 0.0
+        for lower, upper, rate in income_tax_brackets:
+            self.bracket_base_tax.append(base_tax)
+            base_tax += (upper - lower) * rate
+
+        self._lowers_array = np.array(self.bracket_lowers, dtype=float)
+        self._rates_array = np.array(self.bracket_rates, dtype=float)
+        self._base_tax_array = np.array(self.bracket_base_tax, dtype=float)
+
+    # ---- scalar ----
+    def income_tax_natural(self, annual_income: float, deductions: float) -> float:
+        """Progressive income tax for natural persons"""
+        taxable_income = max(0, annual_income - deductions)
+        i = max(bisect_right(self.bracket_lowers, taxable_income) - 1, 0)
+        return self.bracket_base_tax[i] + (taxable_income - self.bracket_lowers[i]) * self.bracket_rates[i]
+
+    def income_tax_sas(self, annual_income: float) -> float:
+        """Flat income tax for SAS"""
+        return annual_income * self.sas_tax_rate
+
+    def parafiscales(self, monthly_income: float) -> Dict[str, float]:
+        """Parafiscales (health, pension, ARL) - monthly basis"""
+        salud = monthly_income * self.parafiscales_rates["salud"]
+        pension = monthly_income * self.parafiscales_rates["pension"]
+        arl = monthly_income * self.parafiscales_rates["arl"]
+
+        return {
+            "salud": round(salud, 2),
+            "pension": round(pension, 2),
+            "arl": round(arl, 2),
+            "total": round(salud + pension + arl, 2),
+        }
+
+    def deductions(self, afc: float, mortgage_interest: float) -> float:
+        """Total deductions (AFC + mortgage interest), capped in UVT"""
+        return min(afc, self.max_afc) + min(mortgage_interest, self.max_mortgage)
+
+    # ---- vectorized ----
+    def income_tax_natural_array(self, annual_income: np.ndarray, deductions: np.ndarray) -> np.ndarray:
+        """income_tax_natural over arrays"""
+        taxable_income = np.maximum(0, annual_income - deductions)
+        i = np.maximum(np.searchsorted(self._lowers_array, taxable_income, side="right") - 1, 0)
+        return self._base_tax_array[i] + (taxable_income - self._lowers_array[i]) * self._rates_array[i]
+
+    def deductions_array(self, afc: np.ndarray, mortgage_interest: np.ndarray) -> np.ndarray:
+        """deductions over arrays"""
+        return np.minimum(afc, self.max_afc) + np.minimum(mortgage_interest, self.max_mortgage)
+
+
+# 2025 Colombian Tax Rates
+TAX_RULES = {
+    2025: TaxRules(
+        year=2025,
+        uvt=47065,  # COP (Unidad de Valor Tributario)
+        income_tax_brackets=[
+            (0, 1400 * 95000, 0.00),           # 0% hasta ~133M COP
+            (1400 * 95000, 3500 * 95000, 0.19), # 19% hasta ~332M COP
+            (3500 * 95000, 9200 * 95000, 0.28), # 28% hasta ~874M COP
+            (9200 * 95000, float('inf'), 0.33), # 33% en adelante
+        ],
+        sas_tax_rate=0.35,  # 35% flat rate for SAS
+        parafiscales_rates={
+            "salud": 0.125,      # 12.5% (8.5% empleador + 4% empleado)
+            "pension": 0.16,     # 16% (12% empleador + 4% empleado)
+            "arl": 0.00522       # 0.522% (riesgo I - mínimo)
+        },
+    ),
+}
+
+DEFAULT_TAX_YEAR = 2025
+
+# Bump whenever a rule table changes, so results cached (and ETags issued)
+# under an older rule set are never served again
+RULESET_VERSION = "2025.1"
+
+
+def get_tax_rules(year: int = DEFAULT_TAX_YEAR) -> TaxRules:
+    """Rules of a fiscal year; raises ValueError for years without rules"""
+    try:
+        return TAX_RULES[year]
+    except KeyError:
+        raise ValueError(f"No tax rules for fiscal year {year}")
+
+
+def calculate_taxes(
+    rules: TaxRules,
+    legal_status: str,
+    monthly_income: float,
+    afc_contributions: float,
+    mortgage_interest: float
+) -> dict:
+    """Taxes and parafiscales of one scenario, shaped like TaxResponse"""
+    # Calculate annual income
+    annual_income = monthly_income * 12
+
+    # Calculate deductions
+    deductions = rules.deductions(afc_contributions, mortgage_interest)
+
+    # Calculate income tax based on legal status
+    if legal_status == "natural":
+        income_tax = rules.income_tax_natural(annual_income, deductions)
+    else:  # SAS
+        income_tax = rules.income_tax_sas(annual_income)
+
+    # Calculate parafiscales (monthly, then annualize)
+    parafiscales_monthly = rules.parafiscales(monthly_income)
+    parafiscales_annual = {name: value * 12 for name, value in parafiscales_monthly.items()}
+
+    # Calculate totals
+    total_tax_burden = income_tax + parafiscales_annual["total"]
+    taxable_income = annual_income - deductions if legal_status == "natural" else annual_income
+    net_annual_income = annual_income - total_tax_burden
+    effective_tax_rate = (total_tax_burden / annual_income * 100) if annual_income > 0 else 0
+
+    return {
+        "annual_income": round(annual_income, 2),
+        "taxable_income": round(taxable_income, 2),
+        "income_tax": round(income_tax, 2),
+        "parafiscales": {name: round(value, 2) for name, value in parafiscales_annual.items()},
+        "total_tax_burden": round(total_tax_burden, 2),
+        "net_annual_income": round(net_annual_income, 2),
+        "effective_tax_rate": round(effective_tax_rate, 2),
+        "deductions_applied": round(deductions, 2),
+    }
+
+
+def round_cents(values: np.ndarray) -> np.ndarray:
+    """
+    np.round(values, 2) that agrees with Python's round(): np.round scales by
+    100 first, which can flip values within a few ulps of a half cent, so those
+    (rare) entries are rounded one by one.
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) <= 4 * np.spacing(np.abs(scaled))
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+def calculate_taxes_array(
+    rules: TaxRules,
+    natural: np.ndarray,
+    monthly_income: np.ndarray,
+    afc_contributions: np.ndarray,
+    mortgage_interest: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Array version of calculate_taxes: every argument holds one value per
+    scenario (`natural` is True for Persona Natural, False for SAS) and every
+    returned array holds one result per scenario, with the same rounding.
+    Parafiscales are returned flat as salud/pension/arl/parafiscales_total.
+    """
+    annual_income = monthly_income * 12
+    deductions = rules.deductions_array(afc_contributions, mortgage_interest)
+
+    income_tax = np.where(
+        natural,
+        rules.income_tax_natural_array(annual_income, deductions),
+        annual_income * rules.sas_tax_rate
+    )
+
+    # Parafiscales: rounded monthly, then annualized
+    salud_monthly = monthly_income * rules.parafiscales_rates["salud"]
+    pension_monthly = monthly_income * rules.parafiscales_rates["pension"]
+    arl_monthly = monthly_income * rules.parafiscales_rates["arl"]
+    salud = round_cents(salud_monthly) * 12
+    pension = round_cents(pension_monthly) * 12
+    arl = round_cents(arl_monthly) * 12
+    parafiscales_total = round_cents(salud_monthly + pension_monthly + arl_monthly) * 12
+
+    total_tax_burden = income_tax + parafiscales_total
+    taxable_income = np.where(natural, annual_income - deductions, annual_income)
+    net_annual_income = annual_income - total_tax_burden
+    with np.errstate(divide="ignore", invalid="ignore"):
+        effective_tax_rate = np.where(annual_income > 0, total_tax_burden / annual_income * 100, 0)
+
+    return {
+        "annual_income": round_cents(annual_income),
+        "taxable_income": round_cents(taxable_income),
+        "income_tax": round_cents(income_tax),
+        "salud": round_cents(salud),
+        "pension": round_cents(pension),
+        "arl": round_cents(arl),
+        "parafiscales_total": round_cents(parafiscales_total),
+        "total_tax_burden": round_cents(total_tax_burden),
+        "net_annual_income": round_cents(net_annual_income),
+        "effective_tax_rate": round_cents(effective_tax_rate),
+        "deductions_applied": round_cents(deductions),
+    }
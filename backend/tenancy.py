@@ -0,0 +1,154 @@
+"""
+Tenant-aware access to the ledger.
+
+With FINANZAS_TENANCY=shared (the default) every user reads and writes the
+database of DATABASE_URL, as before. With FINANZAS_TENANCY=per_user each
+user's ledger (categories, transactions, budgets, savings goals, aggregates,
+search index) lives in its own SQLite file under FINANZAS_TENANT_DIR, chosen
+from the user id in the JWT subject; only the users table stays in the main
+database. A user's queries never read another user's rows, per-user tables
+stay small, and ledgers can be spread over servers file by file.
+
+Open tenant engines are kept in a bounded LRU: when it is full the least
+recently used engine is disposed, and reopened on that user's next request.
+A ledger file is created and initialized (schema, search index, default
+categories) the first time its engine is opened in the process; reopening it
+after an eviction skips that step. Only the requests of the user whose ledger
+is being opened wait for it.
+
+Per-user ledgers require SQLite and the sync database layer (not
+FINANZAS_ASYNC_DB=1).
+"""
+from collections import OrderedDict
+from typing import Optional
+import os
+import threading
+
+from fastapi import Depends
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from .database import (
+    get_db, init_ledger, SessionLocal, IS_SQLITE, USE_ASYNC_DB, TENANT_INFO_KEY,
+    DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, _apply_sqlite_pragmas
+)
+from .auth import get_current_user
+from .categories import invalidate_categories
+
+TENANCY = os.getenv("FINANZAS_TENANCY", "shared").lower()
+PER_USER_LEDGERS = TENANCY == "per_user"
+TENANT_DIR = os.getenv("FINANZAS_TENANT_DIR", "./tenants")
+TENANT_ENGINES = int(os.getenv("FINANZAS_TENANT_ENGINES", "64"))  # open engines kept
+TENANT_POOL_SIZE = int(os.getenv("FINANZAS_TENANT_POOL_SIZE", "2"))  # connections per engine
+
+if TENANCY not in ("shared", "per_user"):
+    raise RuntimeError(f"FINANZAS_TENANCY must be 'shared' or 'per_user', not {TENANCY!r}")
+if PER_USER_LEDGERS and not IS_SQLITE:
+    raise RuntimeError("FINANZAS_TENANCY=per_user requires a SQLite DATABASE_URL")
+if PER_USER_LEDGERS and USE_ASYNC_DB:
+    raise RuntimeError("FINANZAS_TENANCY=per_user is not supported with FINANZAS_ASYNC_DB=1")
+
+
+def tenant_database_url(user_id: int) -> str:
+    """SQLite URL of a user's ledger file"""
+    return "sqlite:///" + os.path.join(TENANT_DIR, f"ledger_{int(user_id)}.db")
+
+
+class TenantEngines:
+    """Bounded LRU of user id -> (engine, session factory) for per-user ledger files"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        # Guards the LRU only; opening a ledger holds that user's lock instead,
+        # so a cold open never stalls the requests of other users
+        self._lock = threading.Lock()
+        self._opening_locks = {}  # user id -> lock, kept for the process lifetime
+        self._initialized = set()  # user ids whose ledger file init_ledger has set up
+
+    def _cached(self, user_id: int) -> Optional[sessionmaker]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def sessionmaker_for(self, user_id: int) -> sessionmaker:
+        factory = self._cached(user_id)
+        if factory is not None:
+            return factory
+        with self._lock:
+            opening_lock = self._opening_locks.setdefault(user_id, threading.Lock())
+
+        # Two requests of a new user must not initialize the same file concurrently
+        with opening_lock:
+            factory = self._cached(user_id)
+            if factory is not None:
+                return factory
+
+            os.makedirs(TENANT_DIR, exist_ok=True)
+            engine = create_engine(
+                tenant_database_url(user_id),
+                poolclass=QueuePool,
+                pool_size=TENANT_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                connect_args={"check_same_thread": False},
+            )
+            event.listen(engine, "connect", _apply_sqlite_pragmas)
+            # A ledger reopened after eviction was already initialized by this process
+            if user_id not in self._initialized or not os.path.exists(engine.url.database):
+                init_ledger(engine, tenant_id=user_id)
+                self._initialized.add(user_id)
+            factory = sessionmaker(
+                autocommit=False, autoflush=False, bind=engine, info={TENANT_INFO_KEY: user_id}
+            )
+
+            evicted = []
+            with self._lock:
+                self._entries[user_id] = (engine, factory)
+                while len(self._entries) > self.maxsize:
+                    evicted.append(self._entries.popitem(last=False))
+
+        for evicted_id, (evicted_engine, _) in evicted:
+            # Connections still checked out by requests are closed when returned
+            evicted_engine.dispose()
+            invalidate_categories(evicted_id)
+        return factory
+
+    def dispose_all(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for engine, _ in entries:
+            engine.dispose()
+
+
+tenant_engines = TenantEngines(TENANT_ENGINES)
+
+
+def ledger_session(user_id: Optional[int] = None) -> Session:
+    """New session on a user's ledger (the shared database unless ledgers are per user)"""
+    if not PER_USER_LEDGERS:
+        return SessionLocal()
+    if user_id is None:
+        raise ValueError("A user id is required with FINANZAS_TENANCY=per_user")
+    return tenant_engines.sessionmaker_for(user_id)()
+
+
+# Dependency
+def get_ledger_db(
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Session on the current user's ledger; the request's get_db session when it is shared"""
+    if not PER_USER_LEDGERS:
+        yield db
+        return
+    ledger_db = ledger_session(current_user.id)
+    try:
+        yield ledger_db
+    finally:
+        ledger_db.close()
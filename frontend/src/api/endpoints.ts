@@ -10,6 +10,10 @@ import type {
   MonthlySummary,
   TaxRequest,
   TaxResponse,
+  TaxCurveParams,
+  TaxCurveResponse,
+  TimeseriesGranularity,
+  TimeseriesResponse,
 } from '@/types';
 
 // Auth
@@ -20,9 +24,16 @@ export const authApi = {
 
 // Transactions
 export const transactionsApi = {
-  list: (params?: { month?: number; year?: number; type?: string; category_id?: number; limit?: number }) =>
+  // The cursor for the next page is returned in the X-Next-Cursor response header.
+  // `fields` (e.g. 'id,date,amount') trims each row to those columns.
+  // `from`/`to` ('YYYY-MM-DD', inclusive) limit the list to a range of days.
+  list: (params?: { month?: number; year?: number; type?: string; category_id?: number; limit?: number; cursor?: string; fields?: string; from?: string; to?: string }) =>
     apiClient.get<Transaction[]>('/financial/transactions', { params }),
 
+  // Every word of `q` must appear (as a prefix) in the description or notes; best matches first.
+  search: (params: { q: string; month?: number; year?: number; type?: string; category_id?: number; limit?: number }) =>
+    apiClient.get<Transaction[]>('/financial/transactions/search', { params }),
+
   create: (data: TransactionCreate) =>
     apiClient.post<Transaction>('/financial/transactions', data),
 
@@ -41,15 +52,42 @@ export const categoriesApi = {
 
 // Summary
 export const summaryApi = {
-  get: (params?: { month?: number; year?: number }) =>
+  // Either month/year or a range of days with from/to ('YYYY-MM-DD', inclusive)
+  get: (params?: { month?: number; year?: number; from?: string; to?: string }) =>
     apiClient.get<FinancialSummary>('/financial/summary', { params }),
 
   monthly: (year: number) =>
     apiClient.get<MonthlySummary[]>('/financial/summary/monthly', { params: { year } }),
+
+  // Several years in one request (?years=2025&years=2026) for year-over-year charts
+  monthlyByYears: (years: number[]) =>
+    apiClient.get<MonthlySummary[]>('/financial/summary/monthly', {
+      params: { years },
+      paramsSerializer: { indexes: null },
+    }),
+
+  // Every month touched by a range of days; edge months only count the days in range
+  monthlyByRange: (from: string, to: string) =>
+    apiClient.get<MonthlySummary[]>('/financial/summary/monthly', { params: { from, to } }),
+};
+
+// Analytics
+export const analyticsApi = {
+  // Running balance, rolling category averages and period-over-period changes
+  timeseries: (params?: {
+    granularity?: TimeseriesGranularity;
+    window?: number;
+    from?: string;
+    to?: string;
+  }) => apiClient.get<TimeseriesResponse>('/financial/analytics/timeseries', { params }),
 };
 
 // Tax Calculator (no authentication required)
 export const taxApi = {
   calculate: (data: TaxRequest) =>
     apiClient.post<TaxResponse>('/calculate', data),
+
+  // Whole income range in one request, for charts
+  curve: (params: TaxCurveParams) =>
+    apiClient.get<TaxCurveResponse>('/calculate/curve', { params }),
 };
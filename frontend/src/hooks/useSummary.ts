@@ -14,3 +14,11 @@ export const useMonthlySummaries = (year: number) => {
     queryFn: () => summaryApi.monthly(year).then(res => res.data),
   });
 };
+
+export const useMonthlySummariesByYears = (years: number[]) => {
+  return useQuery({
+    queryKey: ['monthlySummaries', ...years],
+    queryFn: () => summaryApi.monthlyByYears(years).then(res => res.data),
+    enabled: years.length > 0,
+  });
+};
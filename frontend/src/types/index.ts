@@ -87,6 +87,7 @@ export interface TaxRequest {
   afc_contributions: number;
   mortgage_interest: number;
   patrimony: number;
+  year?: number;
 }
 
 export interface ParafiscalesDetail {
@@ -106,3 +107,51 @@ export interface TaxResponse {
   effective_tax_rate: number;
   deductions_applied: number;
 }
+
+export interface TaxCurveParams {
+  income_min: number;
+  income_max: number;
+  step: number;
+  legal_status?: 'natural' | 'sas';
+  afc_contributions?: number;
+  mortgage_interest?: number;
+  year?: number;
+}
+
+// One value per income point in every array
+export interface TaxCurveResponse {
+  legal_status: 'natural' | 'sas';
+  year: number;
+  monthly_income: number[];
+  annual_income: number[];
+  income_tax: number[];
+  parafiscales: number[];
+  total_tax_burden: number[];
+  net_annual_income: number[];
+  effective_tax_rate: number[];
+}
+
+// Analytics: one value per period in every array
+export type TimeseriesGranularity = 'daily' | 'weekly' | 'monthly';
+
+export interface CategoryTimeseries {
+  category_id: number;
+  category_name: string;
+  type: 'ingreso' | 'gasto';
+  totals: number[];
+  rolling_average: number[];
+}
+
+export interface TimeseriesResponse {
+  granularity: TimeseriesGranularity;
+  window: number;
+  periods: string[]; // first day of each period (YYYY-MM-DD)
+  income: number[];
+  expenses: number[];
+  net: number[];
+  running_balance: number[];
+  income_change: number[];
+  expenses_change: number[];
+  net_change: number[];
+  categories: CategoryTimeseries[];
+}
@@ -21,6 +21,7 @@ class TaxRequest(BaseModel):
     afc_contributions: float = Field(0, ge=0, description="Aportes a cuentas AFC anuales")
     mortgage_interest: float = Field(0, ge=0, description="Intereses de crédito hipotecario anuales")
     patrimony: float = Field(0, ge=0, description="Patrimonio total en COP")
+    year: int = Field(2025, description="Año fiscal cuyas reglas se aplican")
 
 class ParafiscalesDetail(BaseModel):
     """Detailed parafiscales breakdown"""